@@ -1,11 +1,24 @@
+# first, so startup timings include the other imports
+from backend import startup_profile
+
 from flask import Flask
+from flask_socketio import SocketIO
 
 import os
 import logging
 import logging.handlers
 
+startup_profile.mark("import flask")
+
 from backend.constants import APP_LOGFILE
+from backend.state import global_state
 from blueprints import root, control
+from blueprints.preview import PreviewNamespace
+
+startup_profile.mark("import blueprints")
+
+# the website runs on threads (`flask run`), so streaming does too
+socketio = SocketIO(async_mode="threading")
 
 
 def create_app(test_config=None):
@@ -46,4 +59,17 @@ def create_app(test_config=None):
     app.register_blueprint(root.bp)
     app.register_blueprint(control.bp)
 
+    # live preview of the lights
+    socketio.init_app(app)
+    socketio.on_namespace(PreviewNamespace("/preview"))
+
+    startup_profile.mark("create app")
+
+    # start the script worker now so the first script doesn't wait for the ceiling to be made.
+    # The worker makes the ceiling in its own process, so this doesn't hold up the website
+    if test_config is None:
+        global_state.script_worker()
+        startup_profile.mark("load settings and start script worker")
+
+    startup_profile.log_report()
     return app
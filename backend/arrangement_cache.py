@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""
+Compiled, memory mapped copies of arrangement csv files, so they are only parsed once
+"""
+
+from typing import Any, Callable, Dict, Optional
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from numpy._typing import NDArray
+
+# Bump when the layout of the cache changes, so old caches are rebuilt
+CACHE_VERSION = 1
+
+_META_FILE = "meta.json"
+
+
+def arrangement_cache_dir(file: str) -> str:
+    """Directory the compiled copy of `file` is kept in, next to it"""
+    directory, name = os.path.split(os.path.abspath(file))
+    return os.path.join(directory, "." + name + ".cache")
+
+
+class ArrangementCache:
+    """
+    Compiled copy of an arrangement csv file, kept in a directory next to it.
+
+    The csv is parsed once and its positions, and the spatial index tables built from them,
+    are saved as `.npy` files that later loads memory map instead of parsing the csv again.
+    The cache is checked against the csv's modification time and size, and if those changed,
+    its hash; when the contents changed the cache is rebuilt.
+
+    If the cache directory can't be written, everything is computed in memory instead.
+    """
+
+    def __init__(self, file: str):
+        self._file = file
+        self._dir = arrangement_cache_dir(file)
+        self._writable = True
+        # arrays computed this session, for when the cache can't be written
+        self._memory: Dict[str, NDArray] = {}
+        self._meta = self._load_meta()
+
+    def dimensions(self) -> int:
+        return self._meta["dimensions"]
+
+    def number_rows(self) -> int:
+        """Number of lights listed in the file"""
+        return self._meta["rows"]
+
+    def positions(self, number_lights: int) -> NDArray[np.float64]:
+        """
+        (`number_lights`, dimensions) array where row `i` is the location of light `i`.
+        Lights that don't appear in the file have a location of nan. Read only
+        """
+        return self._array(
+            "positions_%d" % number_lights,
+            lambda: _scatter_positions(self._parse(), number_lights),
+        )
+
+    def spatial_tables(
+        self, number_lights: int, build: Callable[[], Dict[str, NDArray]]
+    ) -> Dict[str, NDArray]:
+        """Spatial index tables for `number_lights` lights, made with `build` if not cached"""
+        key = "grid_%d" % number_lights
+        names = self._meta.get("tables", {}).get(key)
+        if names is not None:
+            tables = {name: self._read(key + "_" + name) for name in names}
+            if all(table is not None for table in tables.values()):
+                return tables  # type: ignore
+
+        tables = build()
+        for name, table in tables.items():
+            self._write(key + "_" + name, table)
+        self._meta.setdefault("tables", {})[key] = list(tables)
+        self._write_meta()
+        return tables
+
+    # ===== Reading and writing the cache ==========
+
+    def _load_meta(self) -> Dict[str, Any]:
+        stat = os.stat(self._file)
+        meta = self._read_meta()
+        if meta is not None and meta.get("version") == CACHE_VERSION:
+            if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+                return meta
+            # touched but maybe not changed, like after a checkout
+            if meta["sha256"] == _hash_file(self._file):
+                meta["mtime_ns"] = stat.st_mtime_ns
+                meta["size"] = stat.st_size
+                self._meta = meta
+                self._write_meta()
+                return meta
+
+        # missing or out of date, so start over
+        shutil.rmtree(self._dir, ignore_errors=True)
+        coordinates = self._parse()
+        meta = {
+            "version": CACHE_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": _hash_file(self._file),
+            "dimensions": coordinates.shape[1] - 1,
+            "rows": coordinates.shape[0],
+        }
+        self._meta = meta
+        self._write("rows", coordinates)
+        self._write_meta()
+        return meta
+
+    def _parse(self) -> NDArray[np.float64]:
+        """Rows of the csv as (index, coordinates...)"""
+        rows = self._memory.get("rows")
+        if rows is None:
+            rows = self._read("rows")
+        if rows is None:
+            rows = _parse_arrangement_file(self._file)
+            self._memory["rows"] = rows
+        return rows
+
+    def _array(self, name: str, build: Callable[[], NDArray]) -> NDArray:
+        array = self._read(name)
+        if array is None:
+            array = build()
+            self._write(name, array)
+            array.setflags(write=False)
+        return array
+
+    def _read(self, name: str) -> Optional[NDArray]:
+        if name in self._memory:
+            return self._memory[name]
+        try:
+            return np.load(os.path.join(self._dir, name + ".npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name: str, array: NDArray) -> None:
+        if not self._writable or not self._atomic_write(
+            name + ".npy", lambda f: np.save(f, array)
+        ):
+            self._memory[name] = array
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._dir, _META_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self) -> None:
+        if self._writable:
+            self._atomic_write(_META_FILE, lambda f: f.write(json.dumps(self._meta)))
+
+    def _atomic_write(self, name: str, write: Callable[[Any], Any]) -> bool:
+        """Writes to a temporary file then moves it into place, so other processes never
+        see a partly written file. Returns False if the cache can't be written"""
+        try:
+            os.makedirs(self._dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+            mode = "w" if name.endswith(".json") else "wb"
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, os.path.join(self._dir, name))
+            return True
+        except OSError as e:
+            logging.getLogger(__name__).warning(
+                "Can't write arrangement cache %s: %s", self._dir, e
+            )
+            self._writable = False
+            return False
+
+
+def _parse_arrangement_file(file: str) -> NDArray[np.float64]:
+    """Rows of the arrangement csv as (index, coordinates...), whatever order the columns
+    are in"""
+    with open(file) as csvfile:
+        header = next(csv.reader(csvfile))
+    header = [column.strip() for column in header]
+    index_column = header.index("index")
+    coordinate_columns = [i for i in range(len(header)) if i != index_column]
+
+    data = np.loadtxt(file, delimiter=",", skiprows=1, ndmin=2)
+    return np.ascontiguousarray(data[:, [index_column] + coordinate_columns])
+
+
+def _scatter_positions(
+    rows: NDArray[np.float64], number_lights: int
+) -> NDArray[np.float64]:
+    indices = rows[:, 0].astype(np.int64)
+    in_range = (indices >= 0) & (indices < number_lights)
+    positions = np.full((number_lights, rows.shape[1] - 1), np.nan)
+    positions[indices[in_range]] = rows[in_range, 1:]
+    return positions
+
+
+def _hash_file(file: str) -> str:
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,14 +1,34 @@
 #!/usr/bin/env python3
 
-from typing import Any, Callable, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from typing_extensions import Self
-import light_arrangements_python
+import time
 
 from backend.backend_types import RGB
+from backend.frame_preview import FramePreview
+from backend.frame_recording import FrameRecorder
+from backend.frame_stats import FrameStats
+from backend.headless_arrangement import (
+    HEADLESS_BACKENDS,
+    RECORD_BACKEND,
+    HeadlessArrangement,
+)
 from backend.indexing_type import IndexingType
+from backend.constants import DEFAULT_MA_PER_CHANNEL
+from backend.output_stage import OutputStage
+from backend.row_layout import NoRowsError, RowLayout, RowView
+from backend.script_interrupt import check_stop
+from backend.script_parameters import ScriptParameters
+from backend.spatial_index import SpatialIndex
+from backend.util import Palette
 import backend.indexing
 
+from numba import jit
 import numpy as np
+from numpy._typing import NDArray
+
+# Number of origins to keep polar coordinate tables for
+POLAR_CACHE_SIZE = 8
 
 
 class Ceiling:
@@ -26,13 +46,27 @@ class Ceiling:
 
         # Reading configs and instantiating the light arrangement
         self._rows = kwargs["rows"]
+        self._row_layout = RowLayout(self._rows) if self._rows else None
         light_arrangement_type = kwargs["type"]
         self._number_children_for_division = kwargs["number_children_for_division"]
 
         dimensions = kwargs["dimensions"]
         arrangement_file = kwargs["arrangement_file"]
 
+        # -- Monitoring
+        self._frame_stats: Optional[FrameStats] = kwargs.get("frame_stats")
+        self._show_ns = 0
+        self._frames_shown = 0
+
+        # -- Parameters that can change while a script runs
+        self._script_parameters: Optional[ScriptParameters] = kwargs.get(
+            "script_parameters"
+        )
+
+        # the light arrangement bindings are only needed by, and loaded for, real displays
         if light_arrangement_type == "test":
+            import light_arrangements_python
+
             sphere_size = kwargs["sphere_size"]
             camera_position = kwargs["camera_position"]
             dimension_mask = kwargs["dimension_mask"]
@@ -46,9 +80,10 @@ class Ceiling:
                 dimension_mask,
             )
         elif light_arrangement_type == "ws281x":
+            import light_arrangements_python
+
             number_lights = kwargs["number_lights"]
             io_pin = kwargs["io_pin"]
-            brightness = kwargs["brightness"]
             pixel_order = kwargs["pixel_order"]
             frequency = kwargs["frequency"]
 
@@ -58,64 +93,381 @@ class Ceiling:
                 self._number_children_for_division,
                 number_lights,
                 io_pin,
-                brightness,
+                255,  # brightness is applied by the output stage
                 pixel_order,
                 frequency,
             )
+        elif light_arrangement_type in HEADLESS_BACKENDS:
+            record_frames = 0
+            if light_arrangement_type == RECORD_BACKEND:
+                record_frames = kwargs.get("record_frames", 600)
+
+            self.light_arrangement = HeadlessArrangement(
+                kwargs["number_lights"],
+                record_frames=record_frames,
+                frame_limit=kwargs.get("frame_limit"),
+                time_frames=kwargs.get("time_frames", 0),
+            )
         else:
             raise ValueError("invalid value: " + light_arrangement_type)
+        self._headless = isinstance(self.light_arrangement, HeadlessArrangement)
+        # Whether render loops should keep to their frame rate, or run as fast as they can
+        self._realtime: bool = kwargs.get("realtime", not self._headless)
+
+        # -- Frame buffer
+        # Scripts draw into `_pixels`; `show` is the only place that talks to the light
+        # arrangement. `_shown` is what the arrangement was last sent, so `show` only has to
+        # push the lights that changed since.
+        self._number_lights = self.light_arrangement.number_lights()
+        self._spatial_index = SpatialIndex.from_arrangement_file(
+            arrangement_file, self._number_lights
+        )
+        self._positions = self._spatial_index.positions()
+        self._unplaced = np.any(np.isnan(self._positions), axis=1)
+        self._field_x = np.ascontiguousarray(self._positions[:, 0])
+        self._field_y = (
+            np.ascontiguousarray(self._positions[:, 1])
+            if self._positions.shape[1] > 1
+            else np.zeros(self._number_lights)
+        )
+        self._polar_cache: Dict[
+            Tuple[float, ...], Tuple[NDArray[np.float64], NDArray[np.float64]]
+        ] = {}
+        self._pixels = np.zeros((self._number_lights, 3), dtype=np.uint8)
+        self._shown = np.zeros((self._number_lights, 3), dtype=np.uint8)
+        self._shown_valid = False
+
+        # -- Output
+        # Gamma, brightness and current limiting applied to each frame in `show`
+        self._output = OutputStage(
+            self._number_lights,
+            brightness=kwargs.get("brightness", 255),
+            gamma=kwargs.get("gamma", 1.0),
+            max_current_ma=kwargs.get("max_current_ma"),
+            ma_per_channel=kwargs.get("ma_per_channel", DEFAULT_MA_PER_CHANNEL),
+        )
+        # last brightness picked up from `_script_parameters`
+        self._parameter_brightness = -1
+
+        # -- Recording
+        # When set, every frame shown is also written to a recording
+        self._recorder: Optional[FrameRecorder] = None
+
+        # -- Preview
+        # When set, shown frames are kept in shared memory for the website to preview instead
+        # of in `_shown`
+        self._frame_preview: Optional[FramePreview] = kwargs.get("frame_preview")
+        if (
+            self._frame_preview is not None
+            and self._frame_preview.number_lights() != self._number_lights
+        ):
+            self._frame_preview = None
 
     # ===== Getting, Setting, Showing ==========
+    def pixels(self) -> NDArray[np.uint8]:
+        """
+        The (number_lights, 3) uint8 frame buffer, indexed by light index.
+        This is not a copy; writing to it changes what the next `show` displays
+        """
+        return self._pixels
+
     def get_by_index(self, index: int) -> RGB:
-        return np.array(self.light_arrangement.get_by_index(index))
+        """Color of light `index`. This is a view into the frame buffer, so copy it before
+        modifying it"""
+        return self._pixels[index]
 
     def set_by_index(self, index: int, color: RGB):
-        self.light_arrangement.set_by_index(index, color)
+        self._pixels[index] = color
 
     def get_closest(
         self, location: List[float], search_distance: float
     ) -> Optional[RGB]:
-        res = self.light_arrangement.get_closest(location, search_distance)
-        return np.array([0, 0, 0]) if res is None else np.array(res)
+        index = self._spatial_index.nearest(location, search_distance)
+        return np.zeros(3, dtype=np.uint8) if index < 0 else self._pixels[index]
 
     def set_closest(self, location: List[float], search_distance: float, color: RGB):
-        self.light_arrangement.set_closest(location, search_distance, color)
+        index = self._spatial_index.nearest(location, search_distance)
+        if index >= 0:
+            self._pixels[index] = color
 
     def set_decreasing_intensity(
         self, location: List[float], fill_distance: float, color: RGB
     ):
-        self.light_arrangement.set_decreasing_intensity(location, fill_distance, color)
+        """Sets every light within `fill_distance` of `location` to `color`, dimming linearly
+        with distance"""
+        indices, intensity = self._falloff(location, fill_distance)
+        self._pixels[indices] = (intensity * np.asarray(color)).astype(np.uint8)
 
     def set_decreasing_intensity_merge(
         self, location: List[float], fill_distance: float, color: RGB
     ):
-        self.light_arrangement.set_decreasing_intensity_merge(
-            location, fill_distance, color
+        """Like `set_decreasing_intensity`, but keeps the brightest of the current and new
+        value of each color channel"""
+        indices, intensity = self._falloff(location, fill_distance)
+        self._pixels[indices] = np.maximum(
+            self._pixels[indices],
+            (intensity * np.asarray(color)).astype(np.uint8),
         )
 
     def set_all_in_box(
         self, low_location: List[float], high_location: List[float], color: RGB
     ):
-        self.light_arrangement.set_all_in_box(low_location, high_location, color)
+        self._pixels[self._spatial_index.in_box(low_location, high_location)] = color
 
     def set_all_in_radius(self, location: List[float], radius: float, color: RGB):
-        self.light_arrangement.set_all_in_radius(location, radius, color)
+        self._pixels[self._spatial_index.in_radius(location, radius)] = color
+
+    # ===== Batch Getting / Setting ==========
+    def get_many(self, indices: NDArray[np.int64]) -> NDArray[np.uint8]:
+        """(K, 3) colors of the lights at `indices`"""
+        return self._pixels[indices]
+
+    def set_many(self, indices: NDArray[np.int64], colors: NDArray[np.int32]) -> None:
+        """Sets the lights at `indices` to `colors`, which is either one color or a (K, 3)
+        array with a color for each index"""
+        self._pixels[indices] = colors
+
+    def get_closest_many(
+        self, locations: NDArray[np.float64], search_distance: float
+    ) -> NDArray[np.uint8]:
+        """(K, 3) colors of the closest light to each of the (K, dimensions) `locations`.
+        Black where no light is within `search_distance`"""
+        indices = self._spatial_index.nearest_many(locations, search_distance)
+        colors = self._pixels[np.maximum(indices, 0)]
+        colors[indices < 0] = 0
+        return colors
+
+    def set_closest_many(
+        self,
+        locations: NDArray[np.float64],
+        search_distance: float,
+        colors: NDArray[np.int32],
+    ) -> None:
+        """`set_closest` for each of the (K, dimensions) `locations` at once. `colors` is
+        either one color or a (K, 3) array"""
+        indices = self._spatial_index.nearest_many(locations, search_distance)
+        found = indices >= 0
+        colors = np.broadcast_to(colors, (len(indices), 3))
+        self._pixels[indices[found]] = colors[found]
+
+    def set_decreasing_intensity_merge_many(
+        self,
+        locations: NDArray[np.float64],
+        fill_distance: float,
+        colors: NDArray[np.int32],
+    ) -> None:
+        """`set_decreasing_intensity_merge` for each of the (K, dimensions) `locations` at
+        once. `colors` is either one color or a (K, 3) array"""
+        locations = np.atleast_2d(np.asarray(locations, dtype=np.float64))
+        colors = np.broadcast_to(colors, (len(locations), 3)).astype(np.float64)
+
+        location_ids, indices, distances = self._spatial_index.in_radius_many(
+            locations, fill_distance
+        )
+        if fill_distance > 0:
+            intensity = 1 - (distances / fill_distance)
+        else:
+            intensity = np.ones_like(distances)
+        _merge_max(
+            self._pixels,
+            indices,
+            (intensity[:, np.newaxis] * colors[location_ids]).astype(np.uint8),
+        )
 
     def clear(self) -> None:
-        """Set every pixel to black (and updates the LEDs)"""
-        self.light_arrangement.fill((0, 0, 0))
+        """Set every pixel to black"""
+        self._pixels[:] = 0
 
     def fill(self, clear_color: RGB) -> None:
         """Set every pixel to the given color"""
-        self.light_arrangement.fill(clear_color)
+        self._pixels[:] = clear_color
 
     def show(self) -> None:
         """Update all pixels with updated colors at once"""
+        # a stopped script stops here, before anything is half written
+        check_stop()
+        start_ns = time.monotonic_ns()
+        self._frames_shown += 1
+        # brightness set from the website while running
+        if (
+            self._script_parameters is not None
+            and self._script_parameters.generation() > 0
+            and self._script_parameters.brightness() != self._parameter_brightness
+        ):
+            self._parameter_brightness = self._script_parameters.brightness()
+            self._output.set_brightness(self._parameter_brightness)
+        if self._recorder is not None:
+            # before the output stage, so replays get the brightness at the time
+            self._recorder.add(self._pixels, start_ns)
+        self._flush(self._output.apply(self._pixels))
         self.light_arrangement.show()
+        self._show_ns += time.monotonic_ns() - start_ns
+
+    def start_recording(self, path: str, name: Optional[str] = None) -> None:
+        """Records every frame shown from now on to `path`; see `backend.frame_recording`.
+        `name` is what the website lists the recording as"""
+        self.stop_recording()
+        self._recorder = FrameRecorder(path, self._number_lights, name)
+
+    def stop_recording(self) -> None:
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    def _flush(self, frame: NDArray[np.uint8]) -> None:
+        """Sends `frame` to the light arrangement.
+
+        The light arrangement bindings only take one light at a time, so this sends a single
+        `fill` when the whole frame is one color and otherwise only the lights that changed
+        since the last flush."""
+        if self._headless:
+            self.light_arrangement.set_frame(frame)
+        elif np.all(frame == frame[0]):
+            if not (self._shown_valid and np.all(self._shown == frame[0])):
+                self.light_arrangement.fill(tuple(frame[0].tolist()))
+        else:
+            if self._shown_valid:
+                changed = np.flatnonzero(np.any(frame != self._shown, axis=1))
+            else:
+                changed = np.arange(len(frame))
+            set_by_index = self.light_arrangement.set_by_index
+            for index, color in zip(changed.tolist(), frame[changed].tolist()):
+                set_by_index(index, tuple(color))
+
+        if self._frame_preview is not None:
+            shown = self._frame_preview.begin_write()
+            try:
+                shown[:] = frame
+            finally:
+                # an unfinished write would leave the slot unreadable
+                self._frame_preview.end_write()
+            self._shown = shown
+        else:
+            self._shown[:] = frame
+        self._shown_valid = True
+
+    # ===== Fields ==========
+    def render_field(
+        self,
+        field: Callable[..., NDArray],
+        palette: Optional[Union[Palette, NDArray[np.uint8], List[RGB]]] = None,
+        origin: Optional[List[float]] = None,
+    ) -> None:
+        """
+        Sets every light at once from a function of where the lights are.
+
+        `field` is called once as `field(x, y, r, theta)` with arrays holding the cartesian
+        and polar (around `origin`, or the current polar origin) coordinates of every light,
+        so it should be written with numpy operations or as a numba function over arrays.
+
+        It returns either a (number_lights, 3) array of colors, or a (number_lights,) array of
+        values in 0..1 that are looked up in `palette`, a `Palette` or a list or (P, 3) array
+        of colors. Lights without a location are set to black
+        """
+        x, y = self._field_x, self._field_y
+        r, theta = self.polar_coordinates(
+            origin if origin is not None else self._center
+        )
+        values = np.asarray(field(x, y, r, theta))
+
+        if values.ndim == 1:
+            if palette is None:
+                raise ValueError("a palette is needed to map scalar fields to colors")
+            if isinstance(palette, Palette):
+                palette.take(values, out=self._pixels)
+                self._pixels[self._unplaced] = 0
+                return
+            palette = np.asarray(palette, dtype=np.uint8)
+            palette_indices = values * len(palette)
+            palette_indices[~np.isfinite(palette_indices)] = 0
+            palette_indices = np.clip(palette_indices, 0, len(palette) - 1)
+            np.copyto(self._pixels, palette[palette_indices.astype(np.int64)])
+        else:
+            np.copyto(self._pixels, np.clip(values, 0, 255), casting="unsafe")
+
+        self._pixels[self._unplaced] = 0
+
+    def polar_coordinates(
+        self, origin: List[float]
+    ) -> Tuple[NDArray[np.float64], NDArray[np.float64]]:
+        """
+        (r, theta) arrays holding the polar coordinates of every light around `origin`, with
+        theta in 0..2pi.
+
+        These are computed once per origin and cached, so they are read only
+        """
+        key = tuple(float(c) for c in origin[:2])
+        cached = self._polar_cache.get(key)
+        if cached is not None:
+            return cached
+
+        dx = self._field_x - key[0]
+        dy = self._field_y - key[1]
+        r = np.hypot(dx, dy)
+        theta = np.mod(np.arctan2(dy, dx), 2 * np.pi)
+        r.setflags(write=False)
+        theta.setflags(write=False)
+
+        if len(self._polar_cache) >= POLAR_CACHE_SIZE:
+            del self._polar_cache[next(iter(self._polar_cache))]
+        self._polar_cache[key] = (r, theta)
+        return r, theta
+
+    # ===== Locations ==========
+    def positions(self) -> NDArray[np.float64]:
+        """(number_lights, dimensions) array of where each light is, read from the arrangement
+        file. Lights missing from the file are nan"""
+        return self._positions
+
+    def spatial_index(self) -> SpatialIndex:
+        """Index for finding which lights are near a location, e.g.
+        `ceil.spatial_index().in_radius([0.5, 0.5], 0.2)`"""
+        return self._spatial_index
+
+    def _falloff(
+        self, location: List[float], fill_distance: float
+    ) -> Tuple[NDArray[np.int64], NDArray[np.float64]]:
+        """Indices of lights within `fill_distance` of `location` and their intensity
+        (1 at `location`, 0 at `fill_distance`), shaped to broadcast against colors"""
+        indices, distances = self._spatial_index.in_radius_with_distances(
+            location, fill_distance
+        )
+        if fill_distance <= 0:
+            return indices, np.ones((len(indices), 1))
+        intensity = 1 - (distances / fill_distance)
+        return indices, intensity[:, np.newaxis]
 
     # ===== Metadata ==========
     def number_lights(self) -> int:
-        return self.light_arrangement.number_lights()
+        return self._number_lights
+
+    def frame_stats(self) -> Optional[FrameStats]:
+        """Where render loops on this ceiling record their frame timings, if anywhere"""
+        return self._frame_stats
+
+    def script_parameters(self) -> Optional[ScriptParameters]:
+        """Color, interval and brightness set from the website while a script runs, if any"""
+        return self._script_parameters
+
+    def brightness(self) -> int:
+        return self._output.brightness()
+
+    def set_brightness(self, brightness: int) -> None:
+        """Sets how bright the lights are, 0..255, starting from the next `show`"""
+        self._output.set_brightness(brightness)
+
+    def realtime(self) -> bool:
+        """Whether render loops keep to their frame rate. Headless ceilings can run scripts
+        as fast as they render instead"""
+        return self._realtime
+
+    def frames_shown(self) -> int:
+        """Number of times `show` has been called"""
+        return self._frames_shown
+
+    def show_time_ns(self) -> int:
+        """Total time spent in `show` so far"""
+        return self._show_ns
 
     # ===== Getting / Setting ==========
     def __getitem__(self, key: Any) -> Optional[RGB]:
@@ -128,6 +480,17 @@ class Ceiling:
         """Returns rows information if the indexing is row indexing"""
         return self._rows
 
+    def row_layout(self) -> Optional[RowLayout]:
+        """Precomputed row offsets, or None if there is no `rows` setting"""
+        return self._row_layout
+
+    def row_view(self) -> RowView:
+        """Ragged 2D view for reading and writing whole rows, columns or arrays of
+        (row, col) pairs at once"""
+        if self._row_layout is None:
+            raise NoRowsError("Ceiling has no rows!")
+        return RowView(self._row_layout, self)
+
     # ===== Indexing ==========
 
     def use_linear(self):
@@ -193,6 +556,8 @@ class Ceiling:
         self._search_radius = search_range
         self._set_radius = search_range
         self._center = origin
+        # `render_field` reads the polar coordinates around the polar origin
+        self.polar_coordinates(origin)
         self.indexing_type = IndexingType.POLAR
         self._get_func = backend.indexing.polar_getitem
         self._set_func = backend.indexing.polar_setitem
@@ -243,6 +608,8 @@ class Ceiling:
         self._search_radius = effect_radius
         self._set_radius = effect_radius
         self._center = origin
+        # `render_field` reads the polar coordinates around the polar origin
+        self.polar_coordinates(origin)
         self.indexing_type = IndexingType.FLOAT_POLAR
         self._get_func = backend.indexing.float_polar_getitem
         self._set_func = backend.indexing.float_polar_setitem
@@ -272,11 +639,24 @@ class Ceiling:
         set_radius = self._set_radius
         center = self._center
 
-        block()
-
-        self.indexing_type = indexing_type
-        self._get_func = get_func
-        self._set_func = set_func
-        self._search_radius = search_radius
-        self._set_radius = set_radius
-        self._center = center
+        try:
+            block()
+        finally:
+            self.indexing_type = indexing_type
+            self._get_func = get_func
+            self._set_func = set_func
+            self._search_radius = search_radius
+            self._set_radius = set_radius
+            self._center = center
+
+
+@jit(cache=True, nopython=True)
+def _merge_max(
+    pixels: NDArray[np.uint8], indices: NDArray[np.int64], colors: NDArray[np.uint8]
+) -> None:
+    """Sets each of `pixels[indices]` to the brightest of its current value and `colors`,
+    channel by channel. Indices can repeat"""
+    for n in range(len(indices)):
+        for channel in range(3):
+            if colors[n, channel] > pixels[indices[n], channel]:
+                pixels[indices[n], channel] = colors[n, channel]
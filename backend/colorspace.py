@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+"""
+HSV and HSL conversions and adjustments on whole arrays of colors at once.
+
+Colors are RGB arrays with components 0..255, either a single color of shape (3,) or a frame of
+shape (N, 3), like `Ceiling.pixels()`. HSV and HSL components are all 0..1, like the `colour`
+library's.
+"""
+
+from typing import Optional, Union
+import numpy as np
+from numba import jit
+from numpy._typing import NDArray
+
+Colors = Union[NDArray[np.uint8], NDArray[np.float64], NDArray[np.int64]]
+
+
+# ===== Conversions =========================
+
+
+def rgb_to_hsv(rgb: Colors) -> NDArray[np.float64]:
+    """RGB (0..255) to HSV (0..1)"""
+    frame = _as_frame(rgb) / 255
+    out = np.empty_like(frame)
+    _rgb_to_hsv(frame, out)
+    return out.reshape(np.shape(rgb))
+
+
+def hsv_to_rgb(hsv: NDArray[np.float64]) -> NDArray[np.uint8]:
+    """HSV (0..1) to RGB (0..255)"""
+    frame = _as_frame(hsv)
+    out = np.empty(frame.shape, dtype=np.uint8)
+    _hsv_to_rgb(frame, out)
+    return out.reshape(np.shape(hsv))
+
+
+def rgb_to_hsl(rgb: Colors) -> NDArray[np.float64]:
+    """RGB (0..255) to HSL (0..1)"""
+    frame = _as_frame(rgb) / 255
+    out = np.empty_like(frame)
+    _rgb_to_hsl(frame, out)
+    return out.reshape(np.shape(rgb))
+
+
+def hsl_to_rgb(hsl: NDArray[np.float64]) -> NDArray[np.uint8]:
+    """HSL (0..1) to RGB (0..255)"""
+    frame = _as_frame(hsl)
+    out = np.empty(frame.shape, dtype=np.uint8)
+    _hsl_to_rgb(frame, out)
+    return out.reshape(np.shape(hsl))
+
+
+# ===== Adjustments =========================
+
+
+def rotate_hue(
+    rgb: Colors, amount: float, out: Optional[NDArray[np.uint8]] = None
+) -> NDArray[np.uint8]:
+    """Shifts the hue of every color by `amount` (1 is a full turn around the color wheel).
+    `out` can be `rgb` itself to adjust a frame in place"""
+    return adjust_hsl(rgb, hue_shift=amount, out=out)
+
+
+def scale_saturation(
+    rgb: Colors, factor: float, out: Optional[NDArray[np.uint8]] = None
+) -> NDArray[np.uint8]:
+    """Multiplies the (HSL) saturation of every color by `factor`"""
+    return adjust_hsl(rgb, saturation_scale=factor, out=out)
+
+
+def scale_luminance(
+    rgb: Colors, factor: float, out: Optional[NDArray[np.uint8]] = None
+) -> NDArray[np.uint8]:
+    """Multiplies the luminance of every color by `factor`"""
+    return adjust_hsl(rgb, luminance_scale=factor, out=out)
+
+
+def adjust_hsl(
+    rgb: Colors,
+    hue_shift: float = 0,
+    saturation_scale: float = 1,
+    luminance_scale: float = 1,
+    out: Optional[NDArray[np.uint8]] = None,
+) -> NDArray[np.uint8]:
+    """Shifts hue and scales saturation and luminance of every color in one pass.
+    Saturation and luminance are clamped to 0..1"""
+    frame = _as_frame(rgb)
+    if out is None:
+        out = np.empty(np.shape(rgb), dtype=np.uint8)
+    _adjust_hsl(
+        frame,
+        out.reshape(frame.shape),
+        hue_shift,
+        saturation_scale,
+        luminance_scale,
+    )
+    return out
+
+
+def _as_frame(colors: Colors) -> NDArray[np.float64]:
+    return np.ascontiguousarray(colors, dtype=np.float64).reshape(-1, 3)
+
+
+# ===== Kernels =========================
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _to_byte(value: float) -> np.uint8:
+    return np.uint8(min(max(value * 255 + 0.5, 0), 255))
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _hue(r: float, g: float, b: float, high: float, spread: float) -> float:
+    if spread == 0:
+        return 0.0
+    if high == r:
+        hue = ((g - b) / spread) / 6
+    elif high == g:
+        hue = (2 + (b - r) / spread) / 6
+    else:
+        hue = (4 + (r - g) / spread) / 6
+    return hue % 1
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _rgb_to_hsv(rgb: NDArray[np.float64], out: NDArray[np.float64]) -> None:
+    for i in range(rgb.shape[0]):
+        r, g, b = rgb[i, 0], rgb[i, 1], rgb[i, 2]
+        high = max(r, g, b)
+        spread = high - min(r, g, b)
+        out[i, 0] = _hue(r, g, b, high, spread)
+        out[i, 1] = 0.0 if high == 0 else spread / high
+        out[i, 2] = high
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _hsv_to_rgb(hsv: NDArray[np.float64], out: NDArray[np.uint8]) -> None:
+    for i in range(hsv.shape[0]):
+        r, g, b = _hsv_components(hsv[i, 0], hsv[i, 1], hsv[i, 2])
+        out[i, 0] = _to_byte(r)
+        out[i, 1] = _to_byte(g)
+        out[i, 2] = _to_byte(b)
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _hsv_components(hue: float, sat: float, val: float):
+    sector = (hue % 1) * 6
+    chroma = val * sat
+    x = chroma * (1 - abs(sector % 2 - 1))
+    m = val - chroma
+    if sector < 1:
+        return chroma + m, x + m, m
+    elif sector < 2:
+        return x + m, chroma + m, m
+    elif sector < 3:
+        return m, chroma + m, x + m
+    elif sector < 4:
+        return m, x + m, chroma + m
+    elif sector < 5:
+        return x + m, m, chroma + m
+    return chroma + m, m, x + m
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _rgb_to_hsl(rgb: NDArray[np.float64], out: NDArray[np.float64]) -> None:
+    for i in range(rgb.shape[0]):
+        out[i, 0], out[i, 1], out[i, 2] = _hsl_components(
+            rgb[i, 0], rgb[i, 1], rgb[i, 2]
+        )
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _hsl_components(r: float, g: float, b: float):
+    high = max(r, g, b)
+    low = min(r, g, b)
+    spread = high - low
+    lum = (high + low) / 2
+    if spread == 0:
+        return 0.0, 0.0, lum
+    sat = spread / (high + low) if lum < 0.5 else spread / (2 - high - low)
+    return _hue(r, g, b, high, spread), sat, lum
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _hsl_to_rgb(hsl: NDArray[np.float64], out: NDArray[np.uint8]) -> None:
+    for i in range(hsl.shape[0]):
+        r, g, b = _rgb_components(hsl[i, 0], hsl[i, 1], hsl[i, 2])
+        out[i, 0] = _to_byte(r)
+        out[i, 1] = _to_byte(g)
+        out[i, 2] = _to_byte(b)
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _rgb_components(hue: float, sat: float, lum: float):
+    chroma = (1 - abs(2 * lum - 1)) * sat
+    return (
+        _hsl_channel(hue + 1 / 3, lum, chroma),
+        _hsl_channel(hue, lum, chroma),
+        _hsl_channel(hue - 1 / 3, lum, chroma),
+    )
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _hsl_channel(hue: float, lum: float, chroma: float) -> float:
+    # rises over the first sixth of the turn, stays high for two sixths, then falls
+    sector = (hue % 1) * 6
+    low = lum - chroma / 2
+    if sector < 1:
+        return low + chroma * sector
+    elif sector < 3:
+        return low + chroma
+    elif sector < 4:
+        return low + chroma * (4 - sector)
+    return low
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _adjust_hsl(
+    rgb: NDArray[np.float64],
+    out: NDArray[np.uint8],
+    hue_shift: float,
+    saturation_scale: float,
+    luminance_scale: float,
+) -> None:
+    for i in range(rgb.shape[0]):
+        hue, sat, lum = _hsl_components(
+            rgb[i, 0] / 255, rgb[i, 1] / 255, rgb[i, 2] / 255
+        )
+        sat = min(max(sat * saturation_scale, 0.0), 1.0)
+        lum = min(max(lum * luminance_scale, 0.0), 1.0)
+        r, g, b = _rgb_components(hue + hue_shift, sat, lum)
+        out[i, 0] = _to_byte(r)
+        out[i, 1] = _to_byte(g)
+        out[i, 2] = _to_byte(b)
@@ -5,6 +5,11 @@
 SCRIPTS_PATH = "scripts/light_scripts/"
 APP_LOGFILE = "space_lighting_main.log"
 
+### Output
+
+# Current drawn by one channel of one light at full brightness, in milliamps
+DEFAULT_MA_PER_CHANNEL = 20.0
+
 ### Logging
 
 # name for the logger run inside of scripts started by control _start_script
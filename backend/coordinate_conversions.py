@@ -1,21 +1,73 @@
 #!/usr/bin/env python3
 
-import light_arrangements_python
 import numpy as np
 
-from typing import List
+from typing import List, Union
 from numpy._typing import NDArray
 
 
 def polar(
     rho: float, angular_coords: List[float], center: List[float]
 ) -> NDArray[np.float64]:
-    loc = light_arrangements_python.Loc2.polar(rho, angular_coords, center)
-    return np.array(loc)
+    """
+    Location `rho` from `center` in the direction given by the n-spherical `angular_coords`,
+    in radians; one angle in 2D
+    """
+    if len(angular_coords) == 1:
+        return polar_many(rho, angular_coords[0], center)[0]
+
+    # each angle after the first splits the remaining length into one more dimension
+    direction = np.ones(len(angular_coords) + 1)
+    sines = np.cumprod(np.sin(angular_coords))
+    direction[:-1] = np.cos(angular_coords)
+    direction[1:] *= sines
+    return np.asarray(center, dtype=np.float64) + rho * direction
 
 
 def cylindrical(
     radius: float, theta: float, coords: List[float], center: List[float]
 ) -> NDArray[np.float64]:
-    loc = light_arrangements_python.Loc2.cylindrical(radius, theta, coords, center)
-    return np.array(loc)
+    """
+    Location `radius` from `center` at angle `theta` in the first 2 dimensions, and at
+    `coords` from `center` in the rest
+    """
+    return cylindrical_many(radius, theta, [coords], center)[0]
+
+
+def polar_many(
+    rho: Union[float, NDArray[np.float64]],
+    theta: Union[float, NDArray[np.float64]],
+    center: List[float],
+) -> NDArray[np.float64]:
+    """
+    Converts arrays of polar coordinates around `center` to a (K, 2) array of locations.
+    `rho` and `theta` (in radians) are broadcast against each other
+    """
+    rho, theta = np.broadcast_arrays(
+        np.asarray(rho, dtype=np.float64), np.asarray(theta, dtype=np.float64)
+    )
+    locations = np.empty(rho.shape + (2,))
+    locations[..., 0] = center[0] + rho * np.cos(theta)
+    locations[..., 1] = center[1] + rho * np.sin(theta)
+    return locations.reshape(-1, 2)
+
+
+def cylindrical_many(
+    radius: Union[float, NDArray[np.float64]],
+    theta: Union[float, NDArray[np.float64]],
+    coords: NDArray[np.float64],
+    center: List[float],
+) -> NDArray[np.float64]:
+    """
+    Converts arrays of cylindrical coordinates to a (K, 2 + extra dimensions) array of
+    locations. `radius` and `theta` give the first 2 dimensions around `center`, and the rows of
+    the (K, extra dimensions) `coords` are the rest, offset by the rest of `center`
+    """
+    coords = np.atleast_2d(np.asarray(coords, dtype=np.float64))
+    planar = polar_many(radius, theta, center)
+    if len(planar) == 1 and len(coords) > 1:
+        planar = np.repeat(planar, len(coords), axis=0)
+    extra = coords + np.asarray(center[2:], dtype=np.float64)
+    return np.concatenate(
+        [planar, np.broadcast_to(extra, (len(planar), extra.shape[1]))], axis=1
+    )
@@ -1,21 +1,23 @@
+import hashlib
 import os
-from typing import Callable, Optional, List, Tuple
+from threading import Lock
+from typing import Callable, Dict, Optional, List, Tuple
 
 from backend.constants import SCRIPTS_PATH
+from backend.frame_recording import RECORDING_EXTENSION, recording_name
+
+# How many lines at the top of a script are searched for its name
+HEADER_LINES = 32
+
+_SKIP_NAMES = ["__init__.py"]
 
 
 def get_scripts_and_names(dir: str) -> List[Tuple[str, str]]:
     """
     Parses files in `dir`  for runnable scripts. Returns (name, file_path)
     """
-    skip_names = ["__init__.py"]
-
     files = os.listdir(dir)
-    files = [
-        SCRIPTS_PATH + f
-        for f in files
-        if len(f) > 3 and f[-3:] == ".py" and f not in skip_names
-    ]
+    files = [SCRIPTS_PATH + f for f in files if _is_script(f)]
     names = [parse_script_name_from_file(f) for f in files]
     zipped = list(zip(names, files))
     zipped.sort(key=lambda t: t[0])
@@ -26,12 +28,90 @@ def parse_script_name_from_file(path) -> str:
     """Parses `path` for the name of the script
     The name should be formatted:
     # NAME: <name of script>
-    in a docstring towards the top of the file
+    in a docstring towards the top of the file; only the first `HEADER_LINES` lines are read.
+    Recordings are named in their header
     """
+    if path.endswith(RECORDING_EXTENSION):
+        name = recording_name(path)
+        return name if name is not None else path
+
     SEARCH_STR = "# NAME:"
     with open(path) as file:
-        for line in file.readlines():
+        for _, line in zip(range(HEADER_LINES), file):
             indx = line.find(SEARCH_STR)
             if indx == 0:
                 return line[len(SEARCH_STR) :].strip()
     return path
+
+
+def _is_script(file_name: str) -> bool:
+    if file_name.endswith(RECORDING_EXTENSION):
+        return True
+    return (
+        len(file_name) > 3 and file_name[-3:] == ".py" and file_name not in _SKIP_NAMES
+    )
+
+
+class ScriptCatalog:
+    """
+    Runnable scripts and recordings in a directory and their names, kept in memory.
+
+    `refresh` only lists the directory again when its modification time changes, and only
+    reads a script again when its own modification time changes, so it is cheap enough to
+    call on every request and new, removed or renamed scripts show up straight away.
+    """
+
+    def __init__(self, dir: str):
+        self._dir = dir
+        self._lock = Lock()
+        self._dir_mtime_ns: Optional[int] = None
+        # file name -> (modification time, name of the script)
+        self._entries: Dict[str, Tuple[int, str]] = {}
+        self._scripts: List[Tuple[str, str]] = []
+        self._etag = ""
+
+    def refresh(self) -> None:
+        """Picks up changes to the directory and the scripts in it"""
+        with self._lock:
+            dir_mtime_ns = os.stat(self._dir).st_mtime_ns
+            if dir_mtime_ns != self._dir_mtime_ns:
+                listed = [f for f in os.listdir(self._dir) if _is_script(f)]
+                self._entries = {f: self._entries.get(f, (-1, "")) for f in listed}
+                self._dir_mtime_ns = dir_mtime_ns
+
+            changed = False
+            for file_name, (mtime_ns, _) in list(self._entries.items()):
+                path = self._path(file_name)
+                try:
+                    current_mtime_ns = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    # removed since the directory was listed; the next listing drops it
+                    del self._entries[file_name]
+                    changed = True
+                    continue
+                if current_mtime_ns != mtime_ns:
+                    self._entries[file_name] = (
+                        current_mtime_ns,
+                        parse_script_name_from_file(path),
+                    )
+                    changed = True
+
+            if changed or len(self._scripts) != len(self._entries):
+                self._rebuild()
+
+    def scripts(self) -> List[Tuple[str, str]]:
+        """(name, file_path) of each script sorted by name, as of the last `refresh`"""
+        return self._scripts
+
+    def etag(self) -> str:
+        """Changes whenever the list of scripts does"""
+        return self._etag
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self._dir, file_name)
+
+    def _rebuild(self) -> None:
+        scripts = [(name, self._path(f)) for f, (_, name) in self._entries.items()]
+        scripts.sort(key=lambda t: t[0])
+        self._scripts = scripts
+        self._etag = hashlib.sha1(repr(scripts).encode()).hexdigest()[:16]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""
+Most recent frames shown by the running script, shared with the website so it can preview them
+"""
+
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from numpy._typing import NDArray
+
+from backend.shared_arrays import SharedArrays
+
+# Number of frames kept. The script writes one slot while the website reads the previous one
+PREVIEW_SLOTS = 4
+
+# How many times a read is retried when the script overwrites the slot while it is copied
+_READ_RETRIES = 3
+
+
+class FramePreview(SharedArrays):
+    """
+    Ring of frames in shared memory, written by the script's process every `show` and read by
+    the website.
+
+    Each slot has a sequence number that is odd while the slot is being written (a seqlock), so
+    the script never waits for readers; a reader that sees the number change while copying a
+    frame just tries again.
+    """
+
+    # the sequence number of each slot, then the number of frames written so far
+    _shared_arrays = {"_frames": np.uint8, "_sequence": np.int64}
+    _shared_attributes = ("_number_lights", "_slots")
+
+    def __init__(self, number_lights: int, slots: int = PREVIEW_SLOTS):
+        self._number_lights = number_lights
+        self._slots = slots
+        self._allocate(_frames=slots * number_lights * 3, _sequence=slots + 1)
+
+    def _views_made(self) -> None:
+        self._frames = self._frames.reshape(self._slots, self._number_lights, 3)
+        self._written = self._sequence[self._slots :]
+        self._sequence = self._sequence[: self._slots]
+
+    def number_lights(self) -> int:
+        return self._number_lights
+
+    # ===== Writing (script process) ==========
+
+    def begin_write(self) -> NDArray[np.uint8]:
+        """Returns the next slot to write a frame into. Call `end_write` once it is filled"""
+        slot = int(self._written[0] % self._slots)
+        self._sequence[slot] += 1
+        return self._frames[slot]
+
+    def end_write(self) -> None:
+        slot = int(self._written[0] % self._slots)
+        self._sequence[slot] += 1
+        # written last, so readers only see the frame once it is filled in
+        self._written[0] += 1
+
+    # ===== Reading (website) ==========
+
+    def frames_written(self) -> int:
+        return int(self._written[0])
+
+    def latest(
+        self, out: Optional[NDArray[np.uint8]] = None
+    ) -> Optional[Tuple[int, NDArray[np.uint8]]]:
+        """
+        Copies the newest frame into `out` (or a new array).
+        Returns the frame's number and the frame, or None if there is no frame yet or the
+        script kept overwriting it
+        """
+        if out is None:
+            out = np.empty((self._number_lights, 3), dtype=np.uint8)
+        for _ in range(_READ_RETRIES):
+            number = int(self._written[0]) - 1
+            if number < 0:
+                return None
+            slot = number % self._slots
+            sequence = self._sequence[slot]
+            if sequence % 2 == 1:
+                continue
+            out[:] = self._frames[slot]
+            if self._sequence[slot] == sequence:
+                return number, out
+        return None
+
+
+def delta_encode(
+    frame: NDArray[np.uint8], previous: Optional[NDArray[np.uint8]]
+) -> Dict[str, Any]:
+    """
+    Encodes `frame` as the lights that changed since `previous`: `indices` as little endian
+    uint32s and their `colors` as RGB bytes. Encodes the whole frame, with `keyframe` set,
+    if there is no `previous` or that would be smaller
+    """
+    if previous is not None:
+        changed = np.flatnonzero(np.any(frame != previous, axis=1)).astype("<u4")
+        # 4 bytes of index and 3 of color for each changed light
+        if len(changed) * 7 < frame.size:
+            return {
+                "keyframe": False,
+                "indices": changed.tobytes(),
+                "colors": frame[changed].tobytes(),
+            }
+    return {"keyframe": True, "indices": b"", "colors": frame.tobytes()}
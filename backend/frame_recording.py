@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+"""
+Recordings of the frames a script shows, so expensive scripts can be replayed instead of
+rendered again.
+
+```
+python -m backend.frame_recording scripts/light_scripts/heavy.py heavy.frames --frames 1800
+```
+records 1800 frames of a script using the arrangement in `settings.toml`, without showing
+them. Recordings put in `scripts/light_scripts` are listed on the website with the scripts.
+"""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+import argparse
+import json
+import struct
+import time
+import zlib
+
+import numpy as np
+from numpy._typing import NDArray
+
+RECORDING_EXTENSION = ".frames"
+
+_MAGIC = b"LFRM"
+_VERSION = 1
+# length of the json header, then for each chunk its compressed length and number of frames
+_HEADER_LENGTH = struct.Struct("<I")
+_CHUNK_HEADER = struct.Struct("<II")
+
+# Frames compressed together; bigger chunks compress better but take more memory to replay
+DEFAULT_CHUNK_FRAMES = 60
+
+
+class FrameRecorder:
+    """
+    Writes frames and when they were shown to a file, compressed in chunks.
+
+    Each chunk stores its first frame and then the difference from the frame before, which is
+    mostly zeros for smooth animations and compresses well. Chunks are written as they fill, so
+    a recording that is cut off keeps every complete chunk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        number_lights: int,
+        name: Optional[str] = None,
+        chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+        level: int = 6,
+    ):
+        """`name`: shown on the website for the recording
+        `level`: zlib compression level, 1 (fastest) to 9 (smallest)"""
+        self._file = open(path, "wb")
+        self._level = level
+        self._frames = np.zeros((chunk_frames, number_lights, 3), dtype=np.uint8)
+        self._times_ns = np.zeros(chunk_frames, dtype=np.int64)
+        self._count = 0
+        self._start_ns: Optional[int] = None
+
+        header = json.dumps(
+            {
+                "version": _VERSION,
+                "number_lights": number_lights,
+                "name": name,
+                "chunk_frames": chunk_frames,
+            }
+        ).encode()
+        self._file.write(_MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+
+    def add(self, frame: NDArray[np.uint8], time_ns: int) -> None:
+        """Adds `frame`, shown at `time_ns` on the monotonic clock"""
+        if self._start_ns is None:
+            self._start_ns = time_ns
+        self._frames[self._count] = frame
+        self._times_ns[self._count] = time_ns - self._start_ns
+        self._count += 1
+        if self._count == len(self._frames):
+            self._write_chunk()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        if self._count > 0:
+            self._write_chunk()
+        self._file.close()
+
+    def _write_chunk(self) -> None:
+        frames = self._frames[: self._count]
+        # uint8 differences wrap around, which decoding with a uint8 cumsum undoes
+        deltas = frames.copy()
+        np.subtract(frames[1:], frames[:-1], out=deltas[1:])
+        data = zlib.compress(
+            self._times_ns[: self._count].tobytes() + deltas.tobytes(), self._level
+        )
+        try:
+            self._file.write(_CHUNK_HEADER.pack(len(data), self._count) + data)
+        finally:
+            # a failed write drops the chunk rather than overflowing the buffer
+            self._count = 0
+
+    def __enter__(self) -> "FrameRecorder":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class FrameReader:
+    """Reads a recording made by `FrameRecorder`, one chunk at a time"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._header = _read_header(self._file)
+        except ValueError:
+            self._file.close()
+            raise
+        self._data_start = self._file.tell()
+
+    def number_lights(self) -> int:
+        return self._header["number_lights"]
+
+    def name(self) -> Optional[str]:
+        return self._header.get("name")
+
+    def chunks(self) -> Iterator[Tuple[NDArray[np.int64], NDArray[np.uint8]]]:
+        """(when each frame was shown in ns since the first, frames) of each chunk, in order.
+        A chunk cut off at the end of the file is skipped"""
+        self._file.seek(self._data_start)
+        frame_bytes = self.number_lights() * 3
+        while True:
+            chunk_header = self._file.read(_CHUNK_HEADER.size)
+            if len(chunk_header) < _CHUNK_HEADER.size:
+                return
+            length, count = _CHUNK_HEADER.unpack(chunk_header)
+            compressed = self._file.read(length)
+            if len(compressed) < length:
+                return
+
+            data = zlib.decompress(compressed)
+            if len(data) != count * (8 + frame_bytes):
+                raise ValueError("corrupt chunk in frame recording")
+            times_ns = np.frombuffer(data, dtype=np.int64, count=count)
+            deltas = np.frombuffer(data, dtype=np.uint8, offset=count * 8).reshape(
+                count, self.number_lights(), 3
+            )
+            yield times_ns, np.cumsum(deltas, axis=0, dtype=np.uint8)
+
+    def __iter__(self) -> Iterator[Tuple[int, NDArray[np.uint8]]]:
+        """(when it was shown in ns since the first frame, frame) of every frame"""
+        for times_ns, frames in self.chunks():
+            for time_ns, frame in zip(times_ns.tolist(), frames):
+                yield time_ns, frame
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "FrameReader":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def is_recording(path: str) -> bool:
+    try:
+        with open(path, "rb") as file:
+            _read_header(file)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def recording_name(path: str) -> Optional[str]:
+    """Name stored in the recording at `path`, or None if it has none or isn't a recording"""
+    try:
+        with open(path, "rb") as file:
+            return _read_header(file).get("name")
+    except (OSError, ValueError):
+        return None
+
+
+def replay(path: str, **kwargs) -> None:
+    """Light script that shows the recording at `path` over and over, at the pace it was
+    recorded. Only the current chunk is decompressed at a time"""
+    ceil = kwargs["ceiling"]
+    with FrameReader(path) as reader:
+        if reader.number_lights() != ceil.number_lights():
+            raise ValueError(
+                "recording has %d lights but the ceiling has %d"
+                % (reader.number_lights(), ceil.number_lights())
+            )
+
+        pixels = ceil.pixels()
+        start_ns = time.monotonic_ns()
+        while True:
+            number_frames = 0
+            last_ns = 0
+            for time_ns, frame in reader:
+                remaining = start_ns + time_ns - time.monotonic_ns()
+                if remaining > 0:
+                    time.sleep(remaining / 1_000_000_000)
+                pixels[:] = frame
+                ceil.show()
+                number_frames += 1
+                last_ns = time_ns
+
+            if number_frames == 0:
+                return
+            # start the next loop one average frame after the last one
+            start_ns += last_ns + last_ns // max(number_frames - 1, 1)
+
+
+def _read_header(file) -> Dict[str, Any]:
+    start = file.read(len(_MAGIC) + _HEADER_LENGTH.size)
+    if len(start) < len(_MAGIC) + _HEADER_LENGTH.size or not start.startswith(_MAGIC):
+        raise ValueError("not a frame recording")
+    (length,) = _HEADER_LENGTH.unpack(start[len(_MAGIC) :])
+    header = json.loads(file.read(length))
+    if header.get("version") != _VERSION:
+        raise ValueError(
+            "unsupported frame recording version %s" % header.get("version")
+        )
+    return header
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Records the frames a script shows")
+    parser.add_argument("script")
+    parser.add_argument(
+        "output", help="file to record to, ending in " + RECORDING_EXTENSION
+    )
+    parser.add_argument("--frames", type=int, default=1800)
+    parser.add_argument("--color")
+    parser.add_argument("--interval", type=float)
+    parser.add_argument("--settings", default="settings.toml")
+    args = parser.parse_args()
+
+    from backend.ceiling import Ceiling
+    from backend.files import parse_script_name_from_file
+    from backend.headless_arrangement import FrameLimitReached
+    from backend.script_worker import load_script_function
+    from backend.settings import Settings
+
+    f = load_script_function(args.script)
+    if f is None:
+        raise SystemExit("failed to load " + args.script)
+
+    settings = Settings(args.settings)
+    # real time, so the recording keeps the script's pace
+    ceiling = Ceiling(
+        type="null",
+        rows=settings.rows,
+        number_lights=settings.number_lights,
+        dimensions=settings.dimensions,
+        arrangement_file=settings.arrangement_file,
+        number_children_for_division=settings.number_children_for_division,
+        realtime=True,
+        frame_limit=args.frames,
+    )
+    name = parse_script_name_from_file(args.script) + " (recorded)"
+    ceiling.start_recording(args.output, name)
+    try:
+        f(ceiling=ceiling, color=args.color, interval=args.interval)
+    except FrameLimitReached:
+        pass
+    finally:
+        ceiling.stop_recording()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+Per frame timings of the running script, shared between the script's process and the website
+"""
+
+from typing import Any, Dict
+import numpy as np
+
+from backend.shared_arrays import SharedArrays
+
+# Number of most recent frames kept
+FRAME_STATS_CAPACITY = 600
+
+# Columns of each frame's entry
+_START_NS = 0
+_RENDER_NS = 1
+_SHOW_NS = 2
+_LATENESS_NS = 3
+_NUMBER_FIELDS = 4
+
+# Counters over every frame since the script started
+_FRAMES = 0
+_OVERRUNS = 1
+_DROPPED = 2
+_NUMBER_COUNTERS = 3
+
+
+class FrameStats(SharedArrays):
+    """
+    Fixed size ring buffer of frame timings in shared memory.
+
+    Created by the website before starting a script and passed to the script's process, which
+    is the only writer. Readers get a snapshot without locking, so an entry being written
+    while it is read can be slightly off; that is fine for monitoring.
+    """
+
+    _shared_arrays = {
+        "_frames": np.float64,
+        "_counters": np.int64,
+        "_target_fps": np.float64,
+    }
+    _shared_attributes = ("_capacity",)
+
+    def __init__(self, capacity: int = FRAME_STATS_CAPACITY):
+        self._capacity = capacity
+        self._allocate(
+            _frames=capacity * _NUMBER_FIELDS, _counters=_NUMBER_COUNTERS, _target_fps=1
+        )
+
+    def _views_made(self) -> None:
+        self._frames = self._frames.reshape(self._capacity, _NUMBER_FIELDS)
+
+    # ===== Writing (script process) ==========
+
+    def start(self, fps: float) -> None:
+        """Forgets previous frames; called when a render loop starts"""
+        self._counters[:] = 0
+        self._target_fps[0] = fps
+
+    def record(
+        self,
+        start_ns: int,
+        render_ns: int,
+        show_ns: int,
+        lateness_ns: int,
+        dropped: int,
+    ) -> None:
+        """Adds a frame. `render_ns` is time spent rendering, not counting `show_ns` spent
+        sending the frame to the lights"""
+        frame = self._frames[self._counters[_FRAMES] % self._capacity]
+        frame[_START_NS] = start_ns
+        frame[_RENDER_NS] = render_ns
+        frame[_SHOW_NS] = show_ns
+        frame[_LATENESS_NS] = lateness_ns
+
+        if self._target_fps[0] > 0 and render_ns + show_ns > 1e9 / self._target_fps[0]:
+            self._counters[_OVERRUNS] += 1
+        self._counters[_DROPPED] += dropped
+        # written last, so readers only see the frame once it is filled in
+        self._counters[_FRAMES] += 1
+
+    # ===== Reading (website) ==========
+
+    def summary(self) -> Dict[str, Any]:
+        """Frame rate, timing percentiles (in milliseconds) over the most recent frames, and
+        counts of overrunning and dropped frames"""
+        counters = self._counters.copy()
+        target_fps = float(self._target_fps[0])
+        number_frames = int(min(counters[_FRAMES], self._capacity))
+
+        # oldest to newest
+        newest = int(counters[_FRAMES] % self._capacity)
+        frames = np.roll(self._frames, -newest, axis=0)[
+            self._capacity - number_frames :
+        ]
+
+        result: Dict[str, Any] = {
+            "frames": int(counters[_FRAMES]),
+            "target_fps": target_fps,
+            "achieved_fps": None,
+            "overruns": int(counters[_OVERRUNS]),
+            "dropped_frames": int(counters[_DROPPED]),
+        }
+        if number_frames >= 2:
+            elapsed_ns = frames[-1, _START_NS] - frames[0, _START_NS]
+            if elapsed_ns > 0:
+                result["achieved_fps"] = (number_frames - 1) * 1e9 / elapsed_ns
+
+        frame_ns = np.diff(frames[:, _START_NS])
+        result["frame_ms"] = percentiles_ms(frame_ns)
+        result["render_ms"] = percentiles_ms(frames[:, _RENDER_NS])
+        result["show_ms"] = percentiles_ms(frames[:, _SHOW_NS])
+        result["lateness_ms"] = percentiles_ms(frames[:, _LATENESS_NS])
+        return result
+
+
+def percentiles_ms(values_ns: np.ndarray) -> Dict[str, float]:
+    """p50, p90, p99 and max of durations in ns, in milliseconds. Empty if there are none"""
+    if len(values_ns) == 0:
+        return {}
+    p50, p90, p99 = np.percentile(values_ns, [50, 90, 99]) / 1e6
+    return {
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": float(np.max(values_ns) / 1e6),
+    }
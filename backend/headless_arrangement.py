@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Light arrangement that keeps frames in memory instead of showing them, for running scripts
+without a display or LEDs
+"""
+
+from typing import Optional, Tuple
+import time
+
+import numpy as np
+from numpy._typing import NDArray
+
+from backend.backend_types import RGB
+
+# Names of the headless backends, as used for `type` and in settings
+NULL_BACKEND = "null"
+RECORD_BACKEND = "record"
+HEADLESS_BACKENDS = [NULL_BACKEND, RECORD_BACKEND]
+
+
+class FrameLimitReached(BaseException):
+    """Raised from `show` once the arrangement has shown its frame limit.
+
+    Derives from BaseException so scripts catching `Exception` don't swallow it"""
+
+
+class HeadlessArrangement:
+    """
+    Stands in for the light arrangement bindings, keeping the lights' colors in a numpy array.
+
+    With `record_frames` > 0, every shown frame and when it was shown are also copied into a
+    ring buffer allocated up front, holding the most recent `record_frames` frames.
+    `time_frames` keeps when frames were shown without keeping the frames.
+    """
+
+    def __init__(
+        self,
+        number_lights: int,
+        record_frames: int = 0,
+        frame_limit: Optional[int] = None,
+        time_frames: int = 0,
+    ):
+        """`frame_limit`: raise `FrameLimitReached` after showing this many frames
+        `time_frames`: how many of the most recent show times to keep, at least `record_frames`
+        """
+        self._pixels = np.zeros((number_lights, 3), dtype=np.uint8)
+        self._frame_limit = frame_limit
+        self._frames_shown = 0
+
+        self._record_frames = record_frames
+        self._recorded = np.zeros((record_frames, number_lights, 3), dtype=np.uint8)
+        self._shown_ns = np.zeros(max(record_frames, time_frames), dtype=np.int64)
+
+    def number_lights(self) -> int:
+        return len(self._pixels)
+
+    def fill(self, color: RGB) -> None:
+        self._pixels[:] = color
+
+    def set_by_index(self, index: int, color: RGB) -> None:
+        self._pixels[index] = color
+
+    def set_frame(self, frame: NDArray[np.uint8]) -> None:
+        """Sets every light at once"""
+        self._pixels[:] = frame
+
+    def show(self) -> None:
+        if len(self._shown_ns) > 0:
+            self._shown_ns[self._frames_shown % len(self._shown_ns)] = (
+                time.monotonic_ns()
+            )
+        if self._record_frames > 0:
+            self._recorded[self._frames_shown % self._record_frames] = self._pixels
+        self._frames_shown += 1
+
+        if self._frame_limit is not None and self._frames_shown >= self._frame_limit:
+            raise FrameLimitReached()
+
+    def pixels(self) -> NDArray[np.uint8]:
+        """Colors the lights currently have"""
+        return self._pixels
+
+    def frames_shown(self) -> int:
+        return self._frames_shown
+
+    def show_times_ns(self) -> NDArray[np.int64]:
+        """When the most recently shown frames were shown, in monotonic ns, oldest first"""
+        return self._shown_ns[self._ring_order(len(self._shown_ns))]
+
+    def recorded(self) -> Tuple[NDArray[np.int64], NDArray[np.uint8]]:
+        """(when each was shown in monotonic ns, frames) of the recorded frames, oldest first"""
+        order = self._ring_order(self._record_frames)
+        times_ns = self.show_times_ns()
+        return times_ns[len(times_ns) - len(order) :], self._recorded[order]
+
+    def _ring_order(self, capacity: int) -> NDArray[np.int64]:
+        """Ring buffer slots of the most recent frames, oldest first"""
+        count = min(self._frames_shown, capacity)
+        start = self._frames_shown - count
+        return np.arange(start, start + count) % max(capacity, 1)
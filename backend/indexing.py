@@ -1,81 +1,109 @@
 #!/usr/bin/env python3
 
 from typing import List, Optional, Tuple, Union
+import math
+import numpy as np
+from numpy._typing import NDArray
 
 from backend.backend_types import RGB
 
 # import backend.ceiling
-from backend.coordinate_conversions import polar
+from backend.coordinate_conversions import polar_many
+from backend.row_layout import NoRowsError
 
 
 class Ceiling:
     pass
 
 
-def linear_getitem(key: int, ceiling: Ceiling) -> RGB:
-    return ceiling.get_by_index(key % ceiling.number_lights())
+LinearKey = Union[int, slice, List[int], NDArray[np.int64], NDArray[np.bool_]]
 
 
-def linear_setitem(key: Union[int, slice], color: RGB, ceiling: Ceiling):
-    if type(key) is slice:
-        start = key.start if key.start else 0
-        stop = key.stop if key.stop else ceiling.number_lights()
-        step = key.step if key.step else 1
-        for i in range(start, stop, step):
-            ceiling.set_by_index(i % ceiling.number_lights(), color)
-    else:
+def linear_getitem(key: LinearKey, ceiling: Ceiling) -> RGB:
+    """
+    key: an index, slice, array of indices or boolean mask over every light.
+    An index returns one color, the rest return a (K, 3) array of colors
+    """
+    if isinstance(key, (int, np.integer)):
+        return ceiling.get_by_index(key % ceiling.number_lights())
+    return ceiling.get_many(linear_key_to_indices(key, ceiling.number_lights()))
+
+
+def linear_setitem(key: LinearKey, color: RGB, ceiling: Ceiling):
+    """
+    key: an index, slice, array of indices or boolean mask over every light.
+    `color` is one color, or for anything but an index, a (K, 3) array with a color for each
+    light selected by `key`
+    """
+    if isinstance(key, (int, np.integer)):
         ceiling.set_by_index(key % ceiling.number_lights(), color)
+    else:
+        ceiling.set_many(
+            linear_key_to_indices(key, ceiling.number_lights()), np.asarray(color)
+        )
 
 
-def row_getitem(key: Tuple[int, int], ceiling: Ceiling) -> RGB:
-    """key: (row, col)"""
-    row, col = key
-    index = row_col_to_indx(row, col, ceiling)
-    return ceiling.get_by_index(index)
+def linear_key_to_indices(key: LinearKey, number_lights: int) -> NDArray[np.int64]:
+    """
+    Converts a linear indexing key to an array of light indices.
+    Indices wrap around the strip, so slices like `-5:5` select the 5 lights at each end
+    """
+    if type(key) is slice:
+        step = key.step if key.step else 1
+        if step > 0:
+            start = key.start if key.start is not None else 0
+            stop = key.stop if key.stop is not None else number_lights
+        else:
+            start = key.start if key.start is not None else number_lights - 1
+            stop = key.stop if key.stop is not None else -1
+        return np.arange(start, stop, step) % number_lights
+
+    key = np.asarray(key)
+    if key.dtype == np.bool_:
+        if key.shape != (number_lights,):
+            raise IndexError(
+                "boolean mask has shape %s but there are %s lights"
+                % (key.shape, number_lights)
+            )
+        return np.flatnonzero(key)
+    if not np.issubdtype(key.dtype, np.integer):
+        raise IndexError("linear indexing key must be integers or a boolean mask")
+    return key.astype(np.int64) % number_lights
+
+
+def row_getitem(key: Union[Tuple[int, int], int], ceiling: Ceiling) -> RGB:
+    """key: (row, col) or row
+    if key is a tuple, gets one LED. If key is an int corresponding to the row, gets every LED in
+    the row as a (K, 3) array. `row` and `col` can also be arrays of (row, col) pairs"""
+    return ceiling.row_view()[key]
 
 
 def row_setitem(key: Union[Tuple[int, int], int], color: RGB, ceiling: Ceiling) -> None:
     """
     key: (row, col) or row
     if key is a tuple, will set one LED. If key is an int corresponding to the row, will set
-    every LED in the row
-    """
-    if type(key) is tuple and len(key) == 2:
-        row, col = key
-        index = row_col_to_indx(row, col, ceiling)
-        ceiling.set_by_index(index, color)
-    elif type(key) is int:
-        row = key
-        for i in range(ceiling.rows()[row]):
-            index = row_col_to_indx(row, i, ceiling)
-            ceiling.set_by_index(index, color)
-    else:
+    every LED in the row. `row` and `col` can also be arrays of (row, col) pairs, with either
+    one color or one color per pair
+    """
+    if not (type(key) is tuple and len(key) == 2) and not isinstance(
+        key, (int, np.integer)
+    ):
         raise NotImplementedError("key for row indexing was neither tuple or int")
+    ceiling.row_view()[key] = color
 
 
 def row_col_to_indx(row: int, col: int, ceiling: Ceiling) -> int:
     """Convert row and col position to index in light strip"""
-    if ceiling.rows() is None:
-        raise ValueError("Ceiling has no rows!")
-
-    rows = ceiling.rows()
-    assert rows is not None
+    layout = ceiling.row_layout()
+    if layout is None:
+        raise NoRowsError("Ceiling has no rows!")
+    return layout.index(row, col)
 
-    row = row % len(rows)
-    indx = sum(rows[:row])
-    if row % 2 == 0:
-        indx += col
-    else:
-        indx += rows[row] - col
-    return indx
 
-
-def cartesian_getitem(
-    key: Tuple[float, float], search_radius: float, ceiling: Ceiling
-) -> Optional[RGB]:
+def cartesian_getitem(key: Tuple[float, float], ceiling: Ceiling) -> Optional[RGB]:
     """key: (x, y), x and y in (0..1)"""
     x, y = key
-    return ceiling.get_closest([x, y], search_radius)
+    return ceiling.get_closest([x, y], ceiling._search_radius)
 
 
 def cartesian_setitem(
@@ -127,65 +155,106 @@ def float_cartesian_setitem(
         )
 
 
+PolarKey = Tuple[Union[float, NDArray[np.float64]], Union[float, NDArray[np.float64]]]
+
+
 def polar_getitem(
-    key: Tuple[float, float],
+    key: PolarKey,
     ceiling: Ceiling,
 ) -> Optional[RGB]:
     """
-    key: (radius, theta)
+    key: (radius, theta).
+    `radius` and `theta` can also be arrays, broadcast against each other, which return a
+    (K, 3) array of colors
     """
     r, theta = key
-    loc = polar(r, [theta], ceiling._center)
-    return ceiling.get_closest(loc, ceiling._search_radius)
+    if _is_scalar_polar(r, theta):
+        return ceiling.get_closest(
+            _polar_location(r, theta, ceiling), ceiling._search_radius
+        )
+    return ceiling.get_closest_many(
+        polar_many(r, theta, ceiling._center), ceiling._search_radius
+    )
 
 
 def polar_setitem(
-    key: Union[Tuple[float, float, float], Tuple[float, float]],
+    key: Union[Tuple[float, float, float], PolarKey],
     color: RGB,
     ceiling: Ceiling,
 ) -> None:
     """
     key: either a tuple of 2 or 3 elements.
-    If tuple of 2, represents (r, theta)
+    If tuple of 2, represents (r, theta). `r` and `theta` can also be arrays, broadcast against
+    each other, with either one color or one color per location
     If tuple of 3, represetns (x, y, r) and will fill a circle of radius `r` centered at `(x,
     y)` with `newvalue`. When doing this, `(x, y)` ignore origin, and are based in (0..1, 0..1)
     """
     if len(key) == 3:
         x, y, r = key
         ceiling.set_all_in_radius([x, y], r, color)
+        return
+
+    r, theta = key
+    if _is_scalar_polar(r, theta):
+        ceiling.set_closest(
+            _polar_location(r, theta, ceiling), ceiling._set_radius, color
+        )
     else:
-        r, theta = key
-        loc = polar(r, [theta], ceiling._center)
-        ceiling.set_closest(loc, ceiling._set_radius, color)
+        ceiling.set_closest_many(
+            polar_many(r, theta, ceiling._center),
+            ceiling._set_radius,
+            np.asarray(color),
+        )
 
 
 def float_polar_getitem(
-    key: Tuple[float, float],
+    key: PolarKey,
     ceiling: Ceiling,
 ) -> Optional[RGB]:
     """
-    key: (radius, theta)
+    key: (radius, theta).
+    `radius` and `theta` can also be arrays, broadcast against each other, which return a
+    (K, 3) array of colors
     """
-    r, theta = key
-    loc = polar(r, [theta], ceiling._center)
-    return ceiling.get_closest(loc, ceiling._search_radius)
+    return polar_getitem(key, ceiling)
 
 
 def float_polar_setitem(
-    key: Union[Tuple[float, float, float], Tuple[float, float]],
+    key: Union[Tuple[float, float, float], PolarKey],
     color: RGB,
     ceiling: Ceiling,
 ) -> None:
     """
     key: either a tuple of 2 or 3 elements.
-    If tuple of 2, represents (r, theta)
+    If tuple of 2, represents (r, theta). `r` and `theta` can also be arrays, broadcast against
+    each other, with either one color or one color per location
     If tuple of 3, represetns (x, y, r) and will fill a circle of radius `r` centered at `(x,
     y)` with `newvalue`. When doing this, `(x, y)` ignore origin, and are based in (0..1, 0..1)
     """
     if len(key) == 3:
         x, y, r = key
         ceiling.set_all_in_radius([x, y], r, color)
+        return
+
+    r, theta = key
+    if _is_scalar_polar(r, theta):
+        ceiling.set_decreasing_intensity_merge(
+            _polar_location(r, theta, ceiling), ceiling._set_radius, color
+        )
     else:
-        r, theta = key
-        loc = polar(r, [theta], ceiling._center)
-        ceiling.set_decreasing_intensity_merge(loc, ceiling._set_radius, color)
+        ceiling.set_decreasing_intensity_merge_many(
+            polar_many(r, theta, ceiling._center),
+            ceiling._set_radius,
+            np.asarray(color),
+        )
+
+
+def _is_scalar_polar(r, theta) -> bool:
+    return np.ndim(r) == 0 and np.ndim(theta) == 0
+
+
+def _polar_location(r: float, theta: float, ceiling: Ceiling) -> List[float]:
+    """Location of one polar key; plain floats, since numpy costs more than the lookup for one
+    point"""
+    center = ceiling._center
+    return [center[0] + r * math.cos(theta), center[1] + r * math.sin(theta)]
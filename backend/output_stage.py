@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""
+Corrections applied to each frame as it is sent to the lights
+"""
+
+from typing import Optional
+from numba import jit
+import numpy as np
+from numpy._typing import NDArray
+
+from backend.constants import DEFAULT_MA_PER_CHANNEL
+
+
+class OutputStage:
+    """
+    Gamma correction, global brightness and a cap on total current, applied to the frame in one
+    pass when it is shown.
+
+    Gamma and brightness are combined into one lookup table, so changing brightness only
+    rebuilds 256 entries. When the frame would draw more than `max_current_ma`, every light
+    is dimmed by the same amount to bring it under.
+    """
+
+    def __init__(
+        self,
+        number_lights: int,
+        brightness: int = 255,
+        gamma: float = 1.0,
+        max_current_ma: Optional[float] = None,
+        ma_per_channel: float = DEFAULT_MA_PER_CHANNEL,
+    ):
+        self._gamma = gamma
+        self._brightness = 255
+        self._lut = np.arange(256, dtype=np.uint8)
+        # the cap in lookup table units: the most the channels of a frame can add up to
+        self._max_total = (
+            -1 if max_current_ma is None else int(max_current_ma / ma_per_channel * 255)
+        )
+        self._out = np.zeros((number_lights, 3), dtype=np.uint8)
+        self.set_brightness(brightness)
+
+    def brightness(self) -> int:
+        return self._brightness
+
+    def set_brightness(self, brightness: int) -> None:
+        """`brightness`: 0..255"""
+        self._brightness = int(np.clip(brightness, 0, 255))
+        levels = (np.arange(256) / 255) ** self._gamma
+        self._lut = np.round(levels * self._brightness).astype(np.uint8)
+
+    def apply(self, frame: NDArray[np.uint8]) -> NDArray[np.uint8]:
+        """Returns the corrected frame. The result is reused by the next call"""
+        _apply_output(frame, self._lut, self._max_total, self._out)
+        return self._out
+
+
+@jit(fastmath=True, cache=True, nopython=True)
+def _apply_output(
+    frame: NDArray[np.uint8],
+    lut: NDArray[np.uint8],
+    max_total: int,
+    out: NDArray[np.uint8],
+) -> None:
+    total = 0
+    for i in range(frame.shape[0]):
+        for c in range(3):
+            value = lut[frame[i, c]]
+            out[i, c] = value
+            total += value
+
+    if max_total >= 0 and total > max_total:
+        # fixed point scale so the second pass stays in integers
+        scale = (max_total << 16) // total
+        for i in range(out.shape[0]):
+            for c in range(3):
+                out[i, c] = (out[i, c] * scale) >> 16
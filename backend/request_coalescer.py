@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""
+Collapses bursts of requests that replace each other's effect into the most recent one
+"""
+
+from threading import Condition, Lock
+import time
+from typing import Callable, Dict, Optional, Set, TypeVar
+
+T = TypeVar("T")
+
+
+class RequestCoalescer:
+    """
+    Runs requests one at a time in the order they were submitted, skipping any request that was
+    superseded by a newer one with the same key while it waited.
+
+    ```
+    coalescer = RequestCoalescer()
+    res = coalescer.submit("color", lambda: _change_color(color), debounce=0.01)
+    if res is None:
+        # a newer color request will be applied instead
+    ```
+    """
+
+    def __init__(self, lock: Optional[Lock] = None):
+        """`lock`: held while running a request, a new one by default"""
+        self._lock = lock if lock is not None else Lock()
+        self._tickets_lock = Lock()
+        # notified whenever a request finishes or is superseded
+        self._turn = Condition(self._tickets_lock)
+        # Most recent ticket handed out for each key
+        self._latest: Dict[str, int] = {}
+        # Requests are numbered across keys; each runs once every earlier one is done
+        self._sequence = 0
+        self._next = 1
+        self._done: Set[int] = set()
+        self.coalesced = 0
+
+    def submit(
+        self, key: str, work: Callable[[], T], debounce: float = 0
+    ) -> Optional[T]:
+        """
+        Runs `work` unless a newer request for `key` arrives before it gets to run.
+        Returns what `work` returned, or None if it was skipped.
+
+        `debounce`: seconds to wait before running, giving newer requests a chance to
+        replace this one
+        """
+        with self._turn:
+            ticket = self._latest.get(key, 0) + 1
+            self._latest[key] = ticket
+            self._sequence += 1
+            sequence = self._sequence
+            # an older request for the key that is waiting its turn can give it up now
+            self._turn.notify_all()
+
+        try:
+            if debounce > 0:
+                time.sleep(debounce)
+
+            with self._turn:
+                # a lock alone would let a newer request of another key run first, like a
+                # color change before the start it should apply to
+                while self._next != sequence and self._latest[key] == ticket:
+                    self._turn.wait()
+                if self._latest[key] != ticket:
+                    self.coalesced += 1
+                    return None
+
+            with self._lock:
+                return work()
+        finally:
+            self._finish(sequence)
+
+    def _finish(self, sequence: int) -> None:
+        with self._turn:
+            self._done.add(sequence)
+            while self._next in self._done:
+                self._done.remove(self._next)
+                self._next += 1
+            self._turn.notify_all()
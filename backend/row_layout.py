@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Lookup tables for addressing lights arranged in rows
+"""
+
+from typing import Any, List, Tuple, Union
+import numpy as np
+from numpy._typing import NDArray
+
+from backend.backend_types import RGB
+
+
+class Ceiling:
+    pass
+
+
+RowIndices = Union[int, NDArray[np.int64]]
+
+
+class NoRowsError(ValueError):
+    """Raised when addressing lights by row on a ceiling without a `rows` setting"""
+
+
+class RowLayout:
+    """
+    Where each row starts on the strip and which way it runs, computed once from the `rows`
+    setting.
+
+    The strip zigzags through the rows: even rows run forwards and odd rows run backwards.
+    """
+
+    def __init__(self, rows: List[int]):
+        self._lengths = np.array(rows, dtype=np.int64)
+        self._offsets = np.zeros(len(rows), dtype=np.int64)
+        np.cumsum(self._lengths[:-1], out=self._offsets[1:])
+        self._reversed = (np.arange(len(rows)) % 2) == 1
+        # the same as python ints, for looking up one light without going through numpy
+        self._length_list: List[int] = self._lengths.tolist()
+        self._offset_list: List[int] = self._offsets.tolist()
+
+    def number_rows(self) -> int:
+        return len(self._lengths)
+
+    def row_length(self, row: int) -> int:
+        return int(self._lengths[row % len(self._lengths)])
+
+    def index(self, row: RowIndices, col: RowIndices) -> RowIndices:
+        """Light index of (`row`, `col`). Both can be arrays to look up many at once"""
+        if isinstance(row, (int, np.integer)) and isinstance(col, (int, np.integer)):
+            row = int(row) % len(self._length_list)
+            if row % 2 == 1:
+                return self._offset_list[row] + self._length_list[row] - 1 - int(col)
+            return self._offset_list[row] + int(col)
+
+        row = np.asarray(row) % len(self._lengths)
+        col = np.asarray(col)
+        indices = np.where(
+            self._reversed[row],
+            self._offsets[row] + self._lengths[row] - 1 - col,
+            self._offsets[row] + col,
+        )
+        return int(indices) if indices.ndim == 0 else indices
+
+    def row_indices(self, row: int) -> NDArray[np.int64]:
+        """Light indices of every light in `row`, in column order"""
+        return self.index(
+            np.full(self.row_length(row), row), np.arange(self.row_length(row))
+        )
+
+    def column_indices(self, col: int) -> NDArray[np.int64]:
+        """Light indices of column `col` in each row that is long enough to have it"""
+        rows = np.flatnonzero(self._lengths > col)
+        return self.index(rows, np.full(len(rows), col))
+
+    def key_to_indices(self, key: Any) -> RowIndices:
+        """
+        Converts a `RowView` key to light indices.
+        key: row, (row, col), (row, slice of cols), (:, col) or (array of rows, array of cols)
+        """
+        if isinstance(key, (int, np.integer)):
+            return self.row_indices(key)
+        if type(key) is not tuple or len(key) != 2:
+            raise IndexError("row key must be a row or a (row, col) pair")
+
+        row, col = key
+        if type(row) is slice:
+            if row != slice(None):
+                raise IndexError("only whole columns can be selected with `:`")
+            return self.column_indices(col)
+        if type(col) is slice:
+            cols = np.arange(self.row_length(row))[col]
+            return self.index(np.full(len(cols), row), cols)
+        return self.index(row, col)
+
+
+class RowView:
+    """
+    Ragged 2D view of a `Ceiling` by row and column.
+
+    ```
+    view = ceil.row_view()
+    view[2] = (255, 0, 0)               # all of row 2
+    view[:, 0] = (0, 255, 0)            # first light of every row
+    view[rows, cols] = colors           # arrays of (row, col) pairs
+    colors = view[3, 2:6]               # part of row 3 as a (4, 3) array
+    ```
+    """
+
+    def __init__(self, layout: RowLayout, ceiling: Ceiling):
+        self._layout = layout
+        self._ceiling = ceiling
+
+    def __getitem__(self, key: Any) -> RGB:
+        indices = self._layout.key_to_indices(key)
+        if isinstance(indices, int):
+            return self._ceiling.get_by_index(indices)
+        return self._ceiling.get_many(indices)
+
+    def __setitem__(self, key: Any, color: RGB) -> None:
+        indices = self._layout.key_to_indices(key)
+        if isinstance(indices, int):
+            self._ceiling.set_by_index(indices, color)
+        else:
+            self._ceiling.set_many(indices, np.asarray(color))
+
+    def layout(self) -> RowLayout:
+        return self._layout
+
+    def shape(self) -> Tuple[int, ...]:
+        """Length of each row"""
+        return tuple(
+            self._layout.row_length(row) for row in range(self._layout.number_rows())
+        )
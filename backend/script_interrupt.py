@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+"""
+Stopping a running script at a point where it isn't partway through writing shared state
+"""
+
+
+class ScriptInterrupted(BaseException):
+    """Raised inside of a running script to stop it.
+
+    Derives from BaseException so scripts catching `Exception` don't swallow it"""
+
+
+# Set from the stop signal's handler, which can run between any two bytecodes; the script only
+# stops once it reaches `check_stop`
+_stop_requested = False
+
+
+def request_stop() -> None:
+    global _stop_requested
+    _stop_requested = True
+
+
+def clear_stop() -> None:
+    global _stop_requested
+    _stop_requested = False
+
+
+def check_stop() -> None:
+    """Raises `ScriptInterrupted` if the running script was asked to stop. Called where the
+    script can stop safely, like at the start of `Ceiling.show` and between frames"""
+    global _stop_requested
+    if _stop_requested:
+        _stop_requested = False
+        raise ScriptInterrupted()
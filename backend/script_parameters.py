@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+Color, interval and brightness of the running script, shared between the website and the
+script's process so they can be changed without restarting the script
+"""
+
+from typing import List, Optional
+import colour
+import numpy as np
+
+from backend.shared_arrays import SharedArrays
+
+# Slots of the shared values
+_RED = 0
+_GREEN = 1
+_BLUE = 2
+_INTERVAL = 3
+_BRIGHTNESS = 4
+_NUMBER_VALUES = 5
+
+_GENERATION = 0
+_HAS_COLOR = 1
+_ACCEPTS_UPDATES = 2
+_NUMBER_FLAGS = 3
+
+
+def parse_color(color: str) -> List[int]:
+    """[red, green, blue] of a color name or hex string, raising ValueError if it isn't a color.
+    Same as `backend.util.hex_to_rgb`, which would load numba in the website"""
+    try:
+        rgb = colour.Color(color).rgb
+    except (ValueError, AttributeError) as e:
+        raise ValueError("not a color: %r" % color) from e
+    return [int(c * 255) for c in rgb]
+
+
+class ScriptParameters(SharedArrays):
+    """
+    Parameters of the running script in shared memory.
+
+    The website writes new values and bumps a generation counter; the script's render loop
+    checks the counter every frame and calls `RenderState.parameters_changed` when it moves.
+    Scripts announce whether they handle changes this way with `set_accepts_updates`, so the
+    website knows when it has to restart the script instead.
+    """
+
+    _shared_arrays = {"_values": np.float64, "_flags": np.int64}
+
+    def __init__(self):
+        self._allocate(_values=_NUMBER_VALUES, _flags=_NUMBER_FLAGS)
+        self._values[_INTERVAL] = np.nan
+
+    # ===== Writing (website) ==========
+
+    def reset(
+        self, color: Optional[str], interval: Optional[float], brightness: int
+    ) -> None:
+        """Sets the parameters a new script starts with; None means the script has no color
+        or interval"""
+        self._flags[_ACCEPTS_UPDATES] = 0
+        if interval is None:
+            self._values[_INTERVAL] = np.nan
+        self.update(color=color, interval=interval, brightness=brightness)
+        if color is None:
+            self._flags[_HAS_COLOR] = 0
+
+    def update(
+        self,
+        color: Optional[str] = None,
+        interval: Optional[float] = None,
+        brightness: Optional[int] = None,
+    ) -> None:
+        """Changes the given parameters, leaving the ones that are None as they are.
+        Raises ValueError, before changing anything, if `color` isn't a color"""
+        if color is not None:
+            self._values[_RED : _BLUE + 1] = parse_color(color)
+            self._flags[_HAS_COLOR] = 1
+        if interval is not None:
+            self._values[_INTERVAL] = interval
+        if brightness is not None:
+            self._values[_BRIGHTNESS] = brightness
+        # written last, so scripts only see the change once it is filled in
+        self._flags[_GENERATION] += 1
+
+    def accepts_updates(self) -> bool:
+        """Whether the running script applies changes while running"""
+        return bool(self._flags[_ACCEPTS_UPDATES])
+
+    # ===== Reading (script process) ==========
+
+    def set_accepts_updates(self, accepts: bool) -> None:
+        self._flags[_ACCEPTS_UPDATES] = 1 if accepts else 0
+
+    def generation(self) -> int:
+        """Changes every time a parameter is changed"""
+        return int(self._flags[_GENERATION])
+
+    def color(self) -> Optional[str]:
+        """Color as a hex string, like the `color` argument scripts are started with"""
+        if not self._flags[_HAS_COLOR]:
+            return None
+        red, green, blue = self._values[_RED : _BLUE + 1].astype(int)
+        return "#%02x%02x%02x" % (red, green, blue)
+
+    def interval(self) -> Optional[float]:
+        interval = float(self._values[_INTERVAL])
+        return None if np.isnan(interval) else interval
+
+    def brightness(self) -> int:
+        return int(self._values[_BRIGHTNESS])
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+"""
+Long running process that keeps a `Ceiling` ready and runs light scripts on it
+"""
+
+from ctypes import c_int
+from enum import Enum
+from multiprocess import Pipe, Process
+from multiprocess.sharedctypes import RawValue
+from typing import Callable, Optional
+import functools
+import importlib.util as importlib_util
+import logging, logging.handlers
+import os
+import random
+import signal
+import time
+
+import numpy as np
+
+from backend.constants import SCRIPT_LOGFILE_NAME, SCRIPT_LOGGER_NAME
+from backend.frame_preview import FramePreview
+from backend.frame_recording import RECORDING_EXTENSION, is_recording, replay
+from backend.frame_stats import FrameStats
+from backend.script_interrupt import ScriptInterrupted, clear_stop, request_stop
+from backend.script_parameters import ScriptParameters
+
+# Transition Types
+TRANSITION_START = "start"
+TRANSITION_STOP = "start"
+TRANSITION_COLOR_CHANGE = "color_change"
+
+# How long to wait for a script to stop before restarting the worker
+STOP_TIMEOUT = 2.0
+# How long to wait for the worker to load a script
+LOAD_TIMEOUT = 30.0
+
+# Signal sent to the worker to stop the script it is running
+_STOP_SIGNAL = signal.SIGUSR1
+
+
+class ScriptStatus(Enum):
+    IDLE = 0
+    RUNNING = 1
+    FINISHED = 2
+    CRASHED = 3
+
+
+class ScriptWorker:
+    """
+    Process that creates the `Ceiling` once and then runs each script it is sent on it.
+
+    Starting a script only has to load the script's file instead of starting a new process
+    and rebuilding the light arrangement. A running script is stopped by raising
+    `ScriptInterrupted` inside it the next time it shows a frame, which leaves the worker ready
+    for the next one. If a script won't stop, the worker process is replaced.
+    """
+
+    def __init__(
+        self,
+        frame_stats: FrameStats,
+        script_parameters: ScriptParameters,
+        frame_preview: FramePreview,
+        logging_level: str = "DEBUG",
+    ):
+        self._script_parameters = script_parameters
+        self._worker_args = (
+            frame_stats,
+            script_parameters,
+            frame_preview,
+            logging_level,
+        )
+        self._status = RawValue(c_int, ScriptStatus.IDLE.value)
+        self._start()
+
+    def _start(self) -> None:
+        """Starts a new worker process"""
+        self._status.value = ScriptStatus.IDLE.value
+        self._conn, worker_conn = Pipe()
+        self._process = Process(
+            target=_worker_main,
+            args=(worker_conn, self._status) + self._worker_args,
+            daemon=True,
+        )
+        self._process.start()
+        # only the worker's copy, so reads see the pipe close when the worker dies
+        worker_conn.close()
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def status(self) -> ScriptStatus:
+        """Status of the last script sent to the worker. A worker that died while running a
+        script counts as a crash"""
+        status = ScriptStatus(self._status.value)
+        if status == ScriptStatus.RUNNING and not self.is_alive():
+            return ScriptStatus.CRASHED
+        return status
+
+    def run_script(
+        self,
+        path: str,
+        color: Optional[str],
+        interval: Optional[float],
+        brightness: int,
+        transition_type: str,
+    ) -> bool:
+        """Stops the running script and starts the script at `path`.
+        Returns True if the script was loaded and started"""
+        if not self.stop_script():
+            logging.getLogger(__name__).warning("Starting a new worker")
+            self._start()
+
+        # only once the old script has stopped, since it may still apply parameter changes
+        self._script_parameters.reset(color, interval, brightness)
+        try:
+            self._conn.send((path, color, interval, brightness, transition_type))
+            if not self._conn.poll(LOAD_TIMEOUT):
+                logging.getLogger(__name__).error("Timed out loading script %s", path)
+                self.terminate()
+                return False
+            return self._conn.recv()
+        except (EOFError, BrokenPipeError, OSError):
+            # the worker died, like when it couldn't create the ceiling. Terminating it marks
+            # it dead, so the next script starts a new one
+            logging.getLogger(__name__).exception("Script worker died")
+            self.terminate()
+            return False
+
+    def is_running(self) -> bool:
+        return self.status() == ScriptStatus.RUNNING
+
+    def stop_script(self) -> bool:
+        """Stops the running script, if any. Returns False if it wouldn't stop, in which case
+        the worker is terminated, or if the worker isn't running. `run_script` starts a new
+        worker then"""
+        if not self.is_alive():
+            return False
+        if ScriptStatus(self._status.value) != ScriptStatus.RUNNING:
+            return True
+
+        os.kill(self._process.pid, _STOP_SIGNAL)
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while ScriptStatus(self._status.value) == ScriptStatus.RUNNING:
+            if time.monotonic() > deadline or not self.is_alive():
+                logging.getLogger(__name__).error(
+                    "Script didn't stop; terminating worker"
+                )
+                self.terminate()
+                return False
+            time.sleep(0.005)
+        return True
+
+    def terminate(self) -> None:
+        self._process.terminate()
+        self._process.join(STOP_TIMEOUT)
+        # the exit raised by SIGTERM can be caught by the script, so it may still be running
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+
+
+def load_script_function(path: str) -> Optional[Callable]:
+    """Loads the `run(**kwargs)` function of the script at `path`.
+    Recordings ending in `.frames` load as a script that replays them.
+    Returns None if the script fails to load"""
+    if path.endswith(RECORDING_EXTENSION):
+        if not is_recording(path):
+            return None
+        return functools.partial(replay, path)
+
+    spec = importlib_util.spec_from_file_location("script_func", path)
+    if spec is None:
+        return None
+
+    mod = importlib_util.module_from_spec(spec)
+
+    spec_loader = spec.loader
+    if spec_loader is None:
+        return None
+
+    try:
+        spec_loader.exec_module(mod)
+        return mod.run
+    except:  # Script fails to execute
+        return None
+
+
+# ===== Worker Process =========================
+
+# Whether a script is running in this process, so stop signals that arrive between scripts are
+# ignored
+_script_running = False
+
+
+def _stop_running_script(sig_number, stack_frame):
+    # only a flag, since this can run partway through anything; the script checks it between
+    # frames
+    if _script_running:
+        request_stop()
+
+
+def _exit_gracefully(sig_number, stack_frame):
+    exit(0)
+
+
+def _worker_main(
+    conn,
+    status,
+    frame_stats: FrameStats,
+    script_parameters: ScriptParameters,
+    frame_preview: FramePreview,
+    logging_level: str,
+) -> None:
+    global _script_running
+
+    # imported here so the website's process doesn't have to load the ceiling
+    import colour
+    from backend.ceiling_animation import circle_clear_soft, fade_out
+    from backend.state import global_state as state
+
+    signal.signal(signal.SIGTERM, _exit_gracefully)
+    signal.signal(_STOP_SIGNAL, _stop_running_script)
+
+    FORMAT = "%(asctime)-15s %(message)s"
+    # rotate after 2GB
+    handler = logging.handlers.RotatingFileHandler(
+        SCRIPT_LOGFILE_NAME, maxBytes=1024 * 1024 * 1024 * 2, backupCount=3
+    )
+    logging.basicConfig(
+        format=FORMAT,
+        level=logging.INFO,
+        datefmt="%Y-%m-%d %H:%M:%S",
+        handlers=[handler],
+    )
+    logger = logging.getLogger(SCRIPT_LOGGER_NAME)
+    logger.setLevel(logging_level)
+
+    ceiling = state.create_ceiling(
+        frame_stats=frame_stats,
+        script_parameters=script_parameters,
+        frame_preview=frame_preview,
+    )
+
+    while True:
+        try:
+            command = conn.recv()
+        except EOFError:  # website exited
+            return
+        path, color, interval, brightness, transition_type = command
+
+        f = load_script_function(path)
+        if f is None:
+            conn.send(False)
+            continue
+
+        # undo indexing and brightness changes made by the last script
+        ceiling.use_linear()
+        ceiling.set_brightness(brightness)
+
+        status.value = ScriptStatus.RUNNING.value
+        clear_stop()
+        _script_running = True
+        conn.send(True)
+        try:
+            now = int(time.time())
+            np.random.seed(now)
+            random.seed(now)
+            if transition_type == TRANSITION_COLOR_CHANGE:
+                fade_out(ceiling, 0.2)
+            elif transition_type == TRANSITION_START:
+                circle_clear_soft(ceiling, 0.8, colour.Color("white"))
+            f(ceiling=ceiling, color=color, interval=interval)
+        except ScriptInterrupted:
+            _script_running = False
+            status.value = ScriptStatus.IDLE.value
+        except SystemExit as e:
+            _script_running = False
+            status.value = (
+                ScriptStatus.FINISHED.value
+                if e.code in (0, None)
+                else ScriptStatus.CRASHED.value
+            )
+        except Exception as e:
+            _script_running = False
+            logger.error("Error occured when running the script!!!")
+            logger.error("Error:\n%s", e)
+            status.value = ScriptStatus.CRASHED.value
+        else:
+            _script_running = False
+            status.value = ScriptStatus.FINISHED.value
@@ -6,7 +6,12 @@ Parses configs from a toml file
 
 from typing import List, Optional, Tuple
 import toml
-import csv
+import numpy as np
+from numpy._typing import NDArray
+
+from backend.arrangement_cache import ArrangementCache
+from backend.constants import DEFAULT_MA_PER_CHANNEL
+from backend.headless_arrangement import HEADLESS_BACKENDS
 
 
 class Settings:
@@ -73,6 +78,26 @@ class Settings:
         test_mode = dict["test"].get("test_mode")
         self.test_mode: bool = False if test_mode is None else bool(test_mode)
 
+        # headless backend, used instead of the display or LEDs when set
+        headless_section = dict.get("headless", {})
+        self.headless: Optional[str] = headless_section.get("backend")
+        if self.headless is not None and self.headless not in HEADLESS_BACKENDS:
+            raise ValueError("invalid headless backend: " + self.headless)
+        record_frames = headless_section.get("record_frames")
+        self.record_frames: int = int(record_frames) if record_frames else 600
+        realtime = headless_section.get("realtime")
+        self.realtime: bool = False if realtime is None else bool(realtime)
+
+        # output corrections
+        output_section = dict.get("output", {})
+        gamma = output_section.get("gamma")
+        self.gamma: float = float(gamma) if gamma else 1.0
+        self.max_current_ma: Optional[float] = output_section.get("max_current_ma")
+        ma_per_channel = output_section.get("ma_per_channel")
+        self.ma_per_channel: float = (
+            float(ma_per_channel) if ma_per_channel else DEFAULT_MA_PER_CHANNEL
+        )
+
 
 def preprocess_arrangement_file(file: str) -> Tuple[int, int]:
     """
@@ -80,16 +105,18 @@ def preprocess_arrangement_file(file: str) -> Tuple[int, int]:
 
     Witht this, you acn omit number_lights and dimensions
     """
-    num_lines = sum(1 for line in open(file) if line.strip() != "")
-
-    first_row = True
-    with open(file) as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if first_row:
-                first_row = False
-            else:
-                dimensions = len(row) - 1
-                return dimensions, num_lines - 1
-
-    raise Exception("Failed to preprocess arrangement file!")
+    cache = ArrangementCache(file)
+    if cache.number_rows() == 0:
+        raise Exception("Failed to preprocess arrangement file!")
+    return cache.dimensions(), cache.number_rows()
+
+
+def load_arrangement_positions(file: str, number_lights: int) -> NDArray[np.float64]:
+    """
+    Reads the location of every light from the arrangement csv file.
+
+    Returns a (`number_lights`, dimensions) array where row `i` is the location of light `i`.
+    Lights that don't appear in the file have a location of nan. The array is read only, and
+    memory mapped from the file's cache after the first time it is read
+    """
+    return ArrangementCache(file).positions(number_lights)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+"""
+Numpy arrays in shared memory that can be sent to another process
+"""
+
+from typing import Any, Dict, Tuple
+from multiprocess.sharedctypes import RawArray
+import numpy as np
+
+
+class SharedArrays:
+    """
+    Base for objects whose state is numpy arrays in shared memory, written by one process and
+    read by another.
+
+    Subclasses list their arrays in `_shared_arrays`, call `_allocate` with the length of each,
+    and can override `_views_made` to reshape or split the flat views.
+    """
+
+    # attribute name of each array -> its numpy dtype
+    _shared_arrays: Dict[str, type] = {}
+    # other attributes sent along with the arrays, like their sizes
+    _shared_attributes: Tuple[str, ...] = ()
+
+    def _allocate(self, **lengths: int) -> None:
+        """Creates each array in shared memory with the number of elements in `lengths`"""
+        self._raw = {
+            name: RawArray(np.ctypeslib.as_ctypes_type(dtype), lengths[name])
+            for name, dtype in self._shared_arrays.items()
+        }
+        self._make_views()
+
+    def _make_views(self) -> None:
+        for name, dtype in self._shared_arrays.items():
+            setattr(self, name, np.frombuffer(self._raw[name], dtype=dtype))
+        self._views_made()
+
+    def _views_made(self) -> None:
+        """Called with each array set to a flat view of its shared memory"""
+
+    # numpy views can't be sent to another process, so only send the shared memory and
+    # recreate the views on the other side
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {name: getattr(self, name) for name in self._shared_attributes}
+        state["_raw"] = self._raw
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._make_views()
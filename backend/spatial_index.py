@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+
+"""
+Spatial index over the locations of the lights in an arrangement
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+
+from numba import jit
+from numpy._typing import NDArray
+
+from backend.arrangement_cache import ArrangementCache
+from backend.settings import Settings
+
+Location = Union[List[float], NDArray[np.float64]]
+
+# Average number of lights the grid aims to put in each cell
+LIGHTS_PER_CELL = 2
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the first 2 dimensions of the light locations.
+
+    Queries only look at the grid cells that overlap the area being searched, so their cost
+    depends on how many lights are near the query rather than on the number of lights. Every
+    query returns numpy arrays of light indices, which can be used to index the `Ceiling`'s
+    frame buffer directly.
+    """
+
+    def __init__(
+        self,
+        positions: NDArray[np.float64],
+        tables: Optional[Dict[str, NDArray]] = None,
+    ):
+        """`positions`: (number_lights, dimensions) array of where each light is. Lights with a
+        nan location are left out of the index
+        `tables`: the index's grid, from `tables()` of an index over the same positions
+        """
+        self._positions = np.ascontiguousarray(positions, dtype=np.float64)
+        if tables is None:
+            self._build()
+        else:
+            self._low = tables["low"]
+            self._shape = tables["shape"]
+            self._cell_size = tables["cell_size"]
+            self._order = tables["order"]
+            self._cell_start = tables["cell_start"]
+
+    def _build(self) -> None:
+        placed = np.flatnonzero(~np.any(np.isnan(self._positions), axis=1))
+        grid_positions = np.zeros((len(placed), 2))
+        grid_dimensions = min(self._positions.shape[1], 2)
+        grid_positions[:, :grid_dimensions] = self._positions[placed, :grid_dimensions]
+
+        if len(placed) > 0:
+            self._low = grid_positions.min(axis=0)
+            extent = grid_positions.max(axis=0) - self._low
+        else:
+            self._low = np.zeros(2)
+            extent = np.zeros(2)
+
+        # Square-ish cells sized so each holds about `LIGHTS_PER_CELL` lights
+        extent = np.maximum(extent, 1e-9)
+        number_cells = max(1, len(placed) // LIGHTS_PER_CELL)
+        side = np.sqrt((extent[0] * extent[1]) / number_cells)
+        self._shape = np.clip(np.ceil(extent / side), 1, number_cells).astype(np.int64)
+        self._cell_size = extent / self._shape
+
+        # Lights sorted by cell; lights in cell `c` are `_order[_cell_start[c]:_cell_start[c+1]]`
+        cells = np.floor((grid_positions - self._low) / self._cell_size).astype(
+            np.int64
+        )
+        cells = np.minimum(np.maximum(cells, 0), self._shape - 1)
+        cell_ids = cells[:, 0] * self._shape[1] + cells[:, 1]
+        sort = np.argsort(cell_ids, kind="stable")
+        self._order = placed[sort].astype(np.int64)
+        self._cell_start = np.zeros(self._shape[0] * self._shape[1] + 1, np.int64)
+        np.cumsum(
+            np.bincount(cell_ids, minlength=len(self._cell_start) - 1),
+            out=self._cell_start[1:],
+        )
+
+    @staticmethod
+    def from_settings(settings: Settings) -> "SpatialIndex":
+        """Builds the index for the arrangement file in `settings`"""
+        return SpatialIndex.from_arrangement_file(
+            settings.arrangement_file, settings.number_lights
+        )
+
+    @staticmethod
+    def from_arrangement_file(file: str, number_lights: int) -> "SpatialIndex":
+        """Index over the lights in the arrangement csv `file`, loaded from the file's cache
+        if it was built before"""
+        cache = ArrangementCache(file)
+        positions = cache.positions(number_lights)
+        tables = cache.spatial_tables(
+            number_lights, lambda: SpatialIndex(positions).tables()
+        )
+        return SpatialIndex(positions, tables)
+
+    def tables(self) -> Dict[str, NDArray]:
+        """Arrays making up the grid, for saving and passing back to the constructor"""
+        return {
+            "low": self._low,
+            "shape": self._shape,
+            "cell_size": self._cell_size,
+            "order": self._order,
+            "cell_start": self._cell_start,
+        }
+
+    def positions(self) -> NDArray[np.float64]:
+        return self._positions
+
+    # ===== Queries ==========
+
+    def nearest(self, location: Location, max_distance: float = np.inf) -> int:
+        """Index of the closest light to `location`, or -1 if there is none within
+        `max_distance`"""
+        return int(
+            _nearest(
+                self._positions,
+                self._order,
+                self._cell_start,
+                self._low,
+                self._cell_size,
+                self._shape,
+                _as_location(location),
+                float(max_distance),
+            )
+        )
+
+    def nearest_many(
+        self, locations: NDArray[np.float64], max_distance: float = np.inf
+    ) -> NDArray[np.int64]:
+        """`nearest` for each of the (K, dimensions) `locations`. Returns K indices, -1 where
+        no light is within `max_distance`"""
+        return _nearest_many(
+            self._positions,
+            self._order,
+            self._cell_start,
+            self._low,
+            self._cell_size,
+            self._shape,
+            _as_locations(locations),
+            float(max_distance),
+        )
+
+    def in_radius(self, location: Location, radius: float) -> NDArray[np.int64]:
+        """Indices of every light within `radius` of `location`"""
+        indices, _ = self.in_radius_with_distances(location, radius)
+        return indices
+
+    def in_radius_with_distances(
+        self, location: Location, radius: float
+    ) -> Tuple[NDArray[np.int64], NDArray[np.float64]]:
+        """Indices of every light within `radius` of `location` and their distances to it"""
+        return _in_radius(
+            self._positions,
+            self._order,
+            self._cell_start,
+            self._low,
+            self._cell_size,
+            self._shape,
+            _as_location(location),
+            float(radius),
+        )
+
+    def in_radius_many(
+        self, locations: NDArray[np.float64], radius: float
+    ) -> Tuple[NDArray[np.int64], NDArray[np.int64], NDArray[np.float64]]:
+        """`in_radius_with_distances` for each of the (K, dimensions) `locations`.
+
+        Returns flat arrays (location, index, distance) with one entry for every light that is
+        within `radius` of a location"""
+        return _in_radius_many(
+            self._positions,
+            self._order,
+            self._cell_start,
+            self._low,
+            self._cell_size,
+            self._shape,
+            _as_locations(locations),
+            float(radius),
+        )
+
+    def in_box(self, low: Location, high: Location) -> NDArray[np.int64]:
+        """Indices of every light inside the box spanning `low` to `high`"""
+        return _in_box(
+            self._positions,
+            self._order,
+            self._cell_start,
+            self._low,
+            self._cell_size,
+            self._shape,
+            _as_location(low),
+            _as_location(high),
+        )
+
+    def radius_mask(self, location: Location, radius: float) -> NDArray[np.bool_]:
+        """Boolean mask over every light that is True within `radius` of `location`"""
+        mask = np.zeros(len(self._positions), dtype=np.bool_)
+        mask[self.in_radius(location, radius)] = True
+        return mask
+
+    def box_mask(self, low: Location, high: Location) -> NDArray[np.bool_]:
+        """Boolean mask over every light that is True inside the box spanning `low` to
+        `high`"""
+        mask = np.zeros(len(self._positions), dtype=np.bool_)
+        mask[self.in_box(low, high)] = True
+        return mask
+
+
+def _as_location(location: Location) -> NDArray[np.float64]:
+    return np.ascontiguousarray(location, dtype=np.float64).reshape(-1)
+
+
+def _as_locations(locations: NDArray[np.float64]) -> NDArray[np.float64]:
+    return np.ascontiguousarray(np.atleast_2d(locations), dtype=np.float64)
+
+
+# ===== Kernels =========================
+
+
+@jit(cache=True, nopython=True)
+def _cell(value: float, low: float, cell_size: float, number_cells: int) -> int:
+    """Cell along one axis that `value` falls in, clamped to the grid"""
+    cell = (value - low) / cell_size
+    if cell < 0:
+        return 0
+    if cell > number_cells - 1:
+        return number_cells - 1
+    return int(cell)
+
+
+@jit(cache=True, nopython=True)
+def _grid_y(location):
+    return location[1] if len(location) > 1 else 0.0
+
+
+@jit(cache=True, nopython=True)
+def _distance_squared(positions, index, location) -> float:
+    total = 0.0
+    for d in range(len(location)):
+        offset = positions[index, d] - location[d]
+        total += offset * offset
+    return total
+
+
+@jit(cache=True, nopython=True)
+def _nearest(
+    positions, order, cell_start, low, cell_size, shape, location, max_distance
+):
+    qx = location[0]
+    qy = _grid_y(location)
+    cx = _cell(qx, low[0], cell_size[0], shape[0])
+    cy = _cell(qy, low[1], cell_size[1], shape[1])
+
+    # cells that could hold a light within `max_distance`
+    x0 = _cell(qx - max_distance, low[0], cell_size[0], shape[0])
+    x1 = _cell(qx + max_distance, low[0], cell_size[0], shape[0])
+    y0 = _cell(qy - max_distance, low[1], cell_size[1], shape[1])
+    y1 = _cell(qy + max_distance, low[1], cell_size[1], shape[1])
+
+    best = -1
+    best_distance = max_distance * max_distance
+
+    # Search rings of cells around the query's cell, stopping once everything left is
+    # further away than the closest light found so far
+    k = 0
+    while cx - k >= x0 or cx + k <= x1 or cy - k >= y0 or cy + k <= y1:
+        if k > 0 and best != -1:
+            searched = min(
+                qx - (low[0] + (cx - k + 1) * cell_size[0]),
+                (low[0] + (cx + k) * cell_size[0]) - qx,
+                qy - (low[1] + (cy - k + 1) * cell_size[1]),
+                (low[1] + (cy + k) * cell_size[1]) - qy,
+            )
+            if searched > 0 and searched * searched > best_distance:
+                break
+
+        for i in range(max(cx - k, x0), min(cx + k, x1) + 1):
+            for j in range(max(cy - k, y0), min(cy + k, y1) + 1):
+                if max(abs(i - cx), abs(j - cy)) != k:
+                    continue
+                cell = i * shape[1] + j
+                for n in range(cell_start[cell], cell_start[cell + 1]):
+                    index = order[n]
+                    distance = _distance_squared(positions, index, location)
+                    if distance <= best_distance:
+                        best = index
+                        best_distance = distance
+        k += 1
+
+    return best
+
+
+@jit(cache=True, nopython=True)
+def _nearest_many(
+    positions, order, cell_start, low, cell_size, shape, locations, max_distance
+):
+    result = np.empty(len(locations), dtype=np.int64)
+    for k in range(len(locations)):
+        result[k] = _nearest(
+            positions,
+            order,
+            cell_start,
+            low,
+            cell_size,
+            shape,
+            locations[k],
+            max_distance,
+        )
+    return result
+
+
+@jit(cache=True, nopython=True)
+def _in_radius(positions, order, cell_start, low, cell_size, shape, location, radius):
+    if not radius >= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    qx = location[0]
+    qy = _grid_y(location)
+    x0 = _cell(qx - radius, low[0], cell_size[0], shape[0])
+    x1 = _cell(qx + radius, low[0], cell_size[0], shape[0])
+    y0 = _cell(qy - radius, low[1], cell_size[1], shape[1])
+    y1 = _cell(qy + radius, low[1], cell_size[1], shape[1])
+
+    number_candidates = 0
+    for i in range(x0, x1 + 1):
+        start = i * shape[1]
+        number_candidates += cell_start[start + y1 + 1] - cell_start[start + y0]
+
+    indices = np.empty(number_candidates, dtype=np.int64)
+    distances = np.empty(number_candidates, dtype=np.float64)
+    found = 0
+    radius_squared = radius * radius
+    for i in range(x0, x1 + 1):
+        start = i * shape[1]
+        for n in range(cell_start[start + y0], cell_start[start + y1 + 1]):
+            index = order[n]
+            distance = _distance_squared(positions, index, location)
+            if distance <= radius_squared:
+                indices[found] = index
+                distances[found] = np.sqrt(distance)
+                found += 1
+
+    return indices[:found].copy(), distances[:found].copy()
+
+
+@jit(cache=True, nopython=True)
+def _in_radius_many(
+    positions, order, cell_start, low, cell_size, shape, locations, radius
+):
+    found_indices = []
+    found_distances = []
+    total = 0
+    for k in range(len(locations)):
+        indices, distances = _in_radius(
+            positions, order, cell_start, low, cell_size, shape, locations[k], radius
+        )
+        found_indices.append(indices)
+        found_distances.append(distances)
+        total += len(indices)
+
+    location_ids = np.empty(total, dtype=np.int64)
+    indices = np.empty(total, dtype=np.int64)
+    distances = np.empty(total, dtype=np.float64)
+    start = 0
+    for k in range(len(locations)):
+        end = start + len(found_indices[k])
+        location_ids[start:end] = k
+        indices[start:end] = found_indices[k]
+        distances[start:end] = found_distances[k]
+        start = end
+
+    return location_ids, indices, distances
+
+
+@jit(cache=True, nopython=True)
+def _in_box(positions, order, cell_start, low, cell_size, shape, box_low, box_high):
+    x0 = _cell(box_low[0], low[0], cell_size[0], shape[0])
+    x1 = _cell(box_high[0], low[0], cell_size[0], shape[0])
+    y0 = _cell(_grid_y(box_low), low[1], cell_size[1], shape[1])
+    y1 = _cell(_grid_y(box_high), low[1], cell_size[1], shape[1])
+    if x1 < x0 or y1 < y0:
+        return np.empty(0, dtype=np.int64)
+
+    number_candidates = 0
+    for i in range(x0, x1 + 1):
+        start = i * shape[1]
+        number_candidates += cell_start[start + y1 + 1] - cell_start[start + y0]
+
+    indices = np.empty(number_candidates, dtype=np.int64)
+    found = 0
+    for i in range(x0, x1 + 1):
+        start = i * shape[1]
+        for n in range(cell_start[start + y0], cell_start[start + y1 + 1]):
+            index = order[n]
+            inside = True
+            for d in range(len(box_low)):
+                if (
+                    positions[index, d] < box_low[d]
+                    or positions[index, d] > box_high[d]
+                ):
+                    inside = False
+                    break
+            if inside:
+                indices[found] = index
+                found += 1
+
+    return indices[:found].copy()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+"""
+Timings of each phase of the website starting up
+"""
+
+from typing import Any, Dict, List, Tuple
+import logging
+import time
+
+# When this module was first imported, which `app` does before anything else
+_START_NS = time.monotonic_ns()
+
+# (name of the phase, when it ended)
+_marks: List[Tuple[str, int]] = []
+
+
+def mark(phase: str) -> None:
+    """Records that `phase` just finished; it took the time since the previous mark"""
+    _marks.append((phase, time.monotonic_ns()))
+
+
+def report() -> Dict[str, Any]:
+    """How long each phase took in milliseconds, and how long they took altogether"""
+    phases = []
+    previous_ns = _START_NS
+    for phase, end_ns in _marks:
+        phases.append({"phase": phase, "ms": (end_ns - previous_ns) / 1e6})
+        previous_ns = end_ns
+
+    return {"phases": phases, "total_ms": (previous_ns - _START_NS) / 1e6}
+
+
+def log_report() -> None:
+    logger = logging.getLogger(__name__)
+    startup = report()
+    for phase in startup["phases"]:
+        logger.info("startup: %s took %.1f ms", phase["phase"], phase["ms"])
+    logger.info("startup: took %.1f ms altogether", startup["total_ms"])
@@ -1,21 +1,24 @@
 #!/usr/bin/env python3
 
-import backend.ceiling
-
-from typing import Optional
-from multiprocessing import Process, Pipe
-from threading import Lock
+from typing import TYPE_CHECKING, Any, Optional
 
+from backend.frame_preview import FramePreview
+from backend.frame_stats import FrameStats
+from backend.script_parameters import ScriptParameters
+from backend.script_worker import ScriptWorker
 from backend.settings import Settings
 
-Ceiling = backend.ceiling.Ceiling
+if TYPE_CHECKING:
+    # imported when a ceiling is made, since it loads numba and the light arrangement
+    from backend.ceiling import Ceiling
 
 
 class State:
     def __init__(self) -> None:
         self.settings = Settings("settings.toml")
 
-        self.current_process: Optional[Process] = None
+        # Process that runs scripts
+        self.worker: Optional[ScriptWorker] = None
         self.current_pattern: Optional[str] = None
 
         self.current_script_path: Optional[str] = None
@@ -23,12 +26,53 @@ class State:
         self.current_interval: Optional[float] = None
         self.current_brightness: Optional[int] = None
 
-        self.lock = Lock()
+        # Frame timings of the running script
+        self.frame_stats = FrameStats()
+        # Parameters of the running script, which it can pick up without being restarted
+        self.script_parameters = ScriptParameters()
+        # Frames shown by the running script, for previewing on the website
+        self.frame_preview = FramePreview(self.settings.number_lights)
+
+    def script_worker(self) -> ScriptWorker:
+        """The worker that runs scripts, starting a new one if it isn't running"""
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = ScriptWorker(
+                self.frame_stats, self.script_parameters, self.frame_preview
+            )
+        return self.worker
+
+    def create_ceiling(
+        self,
+        frame_stats: Optional[FrameStats] = None,
+        script_parameters: Optional[ScriptParameters] = None,
+        frame_preview: Optional[FramePreview] = None,
+    ) -> "Ceiling":
+        """`frame_stats`: where render loops should record frame timings
+        `script_parameters`: where scripts read parameter changes while running
+        `frame_preview`: where shown frames are published for the website"""
+        from backend.ceiling import Ceiling
 
-    def create_ceiling(self) -> backend.ceiling.Ceiling:
-        if self.settings.test_mode:
+        if self.settings.headless is not None:
+            return Ceiling(
+                type=self.settings.headless,
+                rows=self.settings.rows,
+                number_lights=self.settings.number_lights,
+                dimensions=self.settings.dimensions,
+                arrangement_file=self.settings.arrangement_file,
+                number_children_for_division=self.settings.number_children_for_division,
+                record_frames=self.settings.record_frames,
+                realtime=self.settings.realtime,
+                brightness=self.settings.brightness,
+                gamma=self.settings.gamma,
+                max_current_ma=self.settings.max_current_ma,
+                ma_per_channel=self.settings.ma_per_channel,
+                frame_stats=frame_stats,
+                script_parameters=script_parameters,
+                frame_preview=frame_preview,
+            )
+        elif self.settings.test_mode:
             assert self.settings.camera_position is not None
-            return backend.ceiling.Ceiling(
+            return Ceiling(
                 type="test",
                 rows=self.settings.rows,
                 number_lights=self.settings.number_lights,
@@ -38,6 +82,13 @@ class State:
                 sphere_size=self.settings.sphere_size,
                 camera_position=tuple(self.settings.camera_position),
                 dimension_mask=self.settings.dimension_mask,
+                brightness=self.settings.brightness,
+                gamma=self.settings.gamma,
+                max_current_ma=self.settings.max_current_ma,
+                ma_per_channel=self.settings.ma_per_channel,
+                frame_stats=frame_stats,
+                script_parameters=script_parameters,
+                frame_preview=frame_preview,
             )
         else:
             return Ceiling(
@@ -51,7 +102,34 @@ class State:
                 brightness=self.settings.brightness,
                 pixel_order=self.settings.pixel_order,
                 frequency=self.settings.frequency,
+                gamma=self.settings.gamma,
+                max_current_ma=self.settings.max_current_ma,
+                ma_per_channel=self.settings.ma_per_channel,
+                frame_stats=frame_stats,
+                script_parameters=script_parameters,
+                frame_preview=frame_preview,
             )
 
 
-global_state = State()
+class _GlobalState:
+    """
+    Stands in for the website's `State`, creating it the first time it is used so importing
+    the website doesn't have to load settings
+    """
+
+    def __init__(self) -> None:
+        object.__setattr__(self, "_state", None)
+
+    def _get(self) -> State:
+        if self._state is None:
+            object.__setattr__(self, "_state", State())
+        return self._state
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._get(), name, value)
+
+
+global_state: State = _GlobalState()  # type: ignore
@@ -16,14 +16,18 @@ class CircleOut(RenderState):
 
         self.running_state = True
         self.MAX_RADIUS = 0.7
+        self.CENTER = [0.5, 0.5]
 
         super().__init__(duration)
 
     def render(self, delta: float, ceil: Ceiling) -> Union[bool, None]:
         fill_radius = self.MAX_RADIUS * self.progress()
         clear_radius = fill_radius - 0.05
-        ceil.set_all_in_radius([0.5, 0.5], fill_radius, self.color)
-        ceil.set_all_in_radius([0.5, 0.5], clear_radius, self.clear_color)
+        # distance of every light from the center, cached by the ceiling
+        distances, _ = ceil.polar_coordinates(self.CENTER)
+        pixels = ceil.pixels()
+        pixels[distances <= fill_radius] = self.color
+        pixels[distances <= clear_radius] = self.clear_color
 
         ceil.show()
 
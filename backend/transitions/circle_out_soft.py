@@ -5,7 +5,6 @@ import numpy as np
 import colour
 
 from backend.ceiling import Ceiling
-from backend.coordinate_conversions import polar
 from backend.util import color_obj_to_rgb
 from scripts.library.render import RenderState
 
@@ -18,6 +17,9 @@ class CircleOutSoft(RenderState):
         self.running_state = True
         self.MAX_RADIUS = 0.9
         self.last_progress = -1.0
+        self.CENTER = [0.5, 0.5]
+        # How far the glow around the edge of the circle reaches
+        self.EDGE_WIDTH = 0.08
 
         super().__init__(duration)
 
@@ -29,12 +31,18 @@ class CircleOutSoft(RenderState):
         fill_radius = self.MAX_RADIUS * prog
         clear_radius = np.clip(fill_radius - 0.1, 0, 1)
 
-        ceil.set_all_in_radius([0.5, 0.5], fill_radius, self.color)
-        for i in np.linspace(0, 2 * np.pi, 15):
-            ceil.set_decreasing_intensity_merge(
-                polar(fill_radius, [i], [0.5, 0.5]), 0.08, self.color
-            )
-        ceil.set_all_in_radius([0.5, 0.5], clear_radius, self.clear_color)
+        # distance of every light from the center, cached by the ceiling
+        distances, _ = ceil.polar_coordinates(self.CENTER)
+        glow = 1 - (np.abs(distances - fill_radius) / self.EDGE_WIDTH)
+        np.nan_to_num(glow, copy=False)
+        np.clip(glow, 0, 1, out=glow)
+
+        pixels = ceil.pixels()
+        pixels[distances <= fill_radius] = self.color
+        np.maximum(
+            pixels, (glow[:, np.newaxis] * self.color).astype(np.uint8), out=pixels
+        )
+        pixels[distances <= clear_radius] = self.clear_color
 
         ceil.show()
 
@@ -17,11 +17,8 @@ class FadeOut(RenderState):
         super().__init__(duration)
 
     def render(self, delta: float, ceil: Ceiling) -> Union[bool, None]:
-        for i in range(ceil.number_lights()):
-            color = ceil.get_by_index(i).astype(np.float64)
-            color *= self.mult_step
-            color = color.astype(np.int32)
-            ceil.set_by_index(i, color)
+        pixels = ceil.pixels()
+        np.multiply(pixels, self.mult_step, out=pixels, casting="unsafe")
 
         ceil.show()
 
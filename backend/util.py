@@ -4,13 +4,14 @@
 
 from functools import lru_cache
 import colour
-from typing import Union, List, Tuple
+from typing import Optional, Union, List, Tuple
 import numpy as np
 
 from numba import jit
 from numpy._typing import NDArray
 
 from backend.backend_types import RGB
+import backend.colorspace
 
 
 # ===== Color Math =========================
@@ -97,7 +98,10 @@ def interpolate_colors(
     color_a = color_format_to_obj(col_a)
     color_b = color_format_to_obj(col_b)
     prog_indx = int(clamp(progress, 0, 1) * 99)
-    res_color = list(color_a.range_to(color_b, 100))[prog_indx]
+    # entry `prog_indx` of `color_a.range_to(color_b, 100)`, without making the other 99
+    hsl_a = np.array(color_a.hsl)
+    step = (np.array(color_b.hsl) - hsl_a) / 99
+    res_color = colour.Color(hsl=tuple(hsl_a + step * prog_indx))
     return colour_rgb_to_neopixel_rgb(res_color.rgb)
 
 
@@ -115,7 +119,8 @@ def color_range(
     color_end: Union[RGB, str, colour.Color],
     number: int,
 ) -> List[RGB]:
-    """Returns `number` colors spanning the range from `color_start` to `color_end`"""
+    """Returns `number` colors spanning the range from `color_start` to `color_end`
+    To map many values to colors, use a `Palette` instead"""
     c1 = color_format_to_obj(color_start)
     c2 = color_format_to_obj(color_end)
     colors_spanning = list(c1.range_to(c2, number))
@@ -128,6 +133,99 @@ def colour_rgb_to_neopixel_rgb(rgb: Tuple[float, float, float]) -> RGB:
     return np.array((np.array(rgb) * 255).astype(int))
 
 
+# ===== Palettes =========================
+
+
+class Palette:
+    """
+    Gradient through `colors`, computed once into a lookup table of `size` colors.
+    Colors are blended in HSL, like `colour.Color.range_to`.
+
+    ```
+    palette = Palette(["red", "blue", (0, 255, 0)])
+    colors = palette.take(values)  # (N,) values in 0..1 to (N, 3) colors
+    ```
+
+    `positions`: where each color is in 0..1, spread out evenly if not given
+    `cyclic`: blend the last color back into the first, and wrap values outside of 0..1
+    around instead of clamping them
+    """
+
+    def __init__(
+        self,
+        colors: List[Union[RGB, str, colour.Color]],
+        size: int = 256,
+        positions: Optional[List[float]] = None,
+        cyclic: bool = False,
+    ):
+        if len(colors) == 0:
+            raise ValueError("a palette needs at least one color")
+        colors = list(colors)
+        if positions is None:
+            positions = list(np.linspace(0, 1, len(colors) + (1 if cyclic else 0)))
+        if cyclic:
+            colors.append(colors[0])
+        if len(positions) != len(colors):
+            raise ValueError("palette needs one position for each color")
+
+        hsl = np.array([color_format_to_obj(c).hsl for c in colors])
+        if cyclic:
+            # the last entry has to stop short of where the first color comes around again
+            samples = np.arange(size) / size
+        else:
+            samples = np.linspace(0, 1, size)
+        lut_hsl = np.column_stack(
+            [np.interp(samples, positions, hsl[:, i]) for i in range(3)]
+        )
+        self._lut = backend.colorspace.hsl_to_rgb(lut_hsl)
+        self._lut.setflags(write=False)
+        self._cyclic = cyclic
+
+    def __len__(self) -> int:
+        return len(self._lut)
+
+    def lut(self) -> NDArray[np.uint8]:
+        """The (size, 3) lookup table; read only"""
+        return self._lut
+
+    def take(
+        self, values: NDArray[np.float64], out: Optional[NDArray[np.uint8]] = None
+    ) -> NDArray[np.uint8]:
+        """Colors of each of `values` (in 0..1) as a (N, 3) array. Values that are not
+        finite get the first color"""
+        values = np.ascontiguousarray(values, dtype=np.float64).reshape(-1)
+        if out is None:
+            out = np.empty((len(values), 3), dtype=np.uint8)
+        _palette_take(values, self._lut, self._cyclic, out)
+        return out
+
+    def color(self, value: float) -> RGB:
+        """Color at `value` (in 0..1)"""
+        return self.take(np.array([value]))[0]
+
+
+# no fastmath, which would assume values are finite and skip the check for them
+@jit(cache=True, nopython=True)
+def _palette_take(
+    values: NDArray[np.float64],
+    lut: NDArray[np.uint8],
+    cyclic: bool,
+    out: NDArray[np.uint8],
+) -> None:
+    size = lut.shape[0]
+    for i in range(values.shape[0]):
+        value = values[i]
+        if not np.isfinite(value):
+            index = 0
+        elif cyclic:
+            index = int((value % 1) * size) % size
+        else:
+            index = int(min(max(value, 0.0), 1.0) * (size - 1) + 0.5)
+        out[i, 0] = lut[index, 0]
+        out[i, 1] = lut[index, 1]
+        out[i, 2] = lut[index, 2]
+
+
 # ===== Math =========================
 
 
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+"""
+Microbenchmarks of the ceiling, indexing modes and color helpers, compared against a baseline.
+
+```
+python -m benchmarks.micro --save-baseline     # before a change
+python -m benchmarks.micro                     # after; exits with 1 if anything got slower
+python -m benchmarks.micro --filter indexing --output results.json
+```
+
+Timings depend on the machine, so the baseline is kept out of the repository; make one on the
+machine the comparison runs on.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+import numpy as np
+
+from benchmarks.scripts import ROOT
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+# How much slower than the baseline a benchmark can get before it counts as a regression
+DEFAULT_THRESHOLD = 0.15
+# Times each benchmark is measured; the fastest is kept, since slower runs are noise
+REPEATS = 5
+
+ARRANGEMENT_FILE = "settings/thousand.csv"
+ROWS = [32] * 32
+COLOR = np.array([255, 136, 0], dtype=np.uint8)
+
+# Sets up a benchmark on the ceiling, returning the operation to time
+Setup = Callable[[Any], Callable[[], Any]]
+
+
+def _set_by_index(ceil) -> Callable[[], Any]:
+    return lambda: ceil.set_by_index(17, COLOR)
+
+
+def _show_headless(ceil) -> Callable[[], Any]:
+    ceil[::2] = COLOR
+    return ceil.show
+
+
+class _PerLightArrangement:
+    """Stands in for the light arrangement bindings, which take one light at a time"""
+
+    def __init__(self, number_lights: int):
+        self._colors = [(0, 0, 0)] * number_lights
+
+    def number_lights(self) -> int:
+        return len(self._colors)
+
+    def set_by_index(self, index: int, color: Tuple[int, int, int]) -> None:
+        self._colors[index] = color
+
+    def fill(self, color: Tuple[int, int, int]) -> None:
+        self._colors = [color] * len(self._colors)
+
+    def show(self) -> None:
+        pass
+
+
+def _show_per_light(ceil) -> Callable[[], Any]:
+    # its own ceiling, so the other benchmarks keep the headless arrangement
+    ceil = _create_ceiling()
+    ceil.light_arrangement = _PerLightArrangement(ceil.number_lights())
+    ceil._headless = False
+
+    # a tenth of the lights change each frame, so only those are sent
+    frames = np.zeros((2, ceil.number_lights(), 3), dtype=np.uint8)
+    frames[:, ::2] = COLOR
+    frames[1, ::10] = 0
+    shown = [0]
+
+    def op():
+        shown[0] ^= 1
+        ceil.pixels()[:] = frames[shown[0]]
+        ceil.show()
+
+    return op
+
+
+def _set_decreasing_intensity_merge(ceil) -> Callable[[], Any]:
+    return lambda: ceil.set_decreasing_intensity_merge([0.3, 0.6], 0.1, COLOR)
+
+
+def _linear(ceil) -> Callable[[], Any]:
+    ceil.use_linear()
+
+    def op():
+        ceil[17] = COLOR
+
+    return op
+
+
+def _linear_slice(ceil) -> Callable[[], Any]:
+    ceil.use_linear()
+
+    def op():
+        ceil[10:500] = COLOR
+
+    return op
+
+
+def _row(ceil) -> Callable[[], Any]:
+    ceil.use_row()
+
+    def op():
+        ceil[3, 7] = COLOR
+
+    return op
+
+
+def _row_whole(ceil) -> Callable[[], Any]:
+    ceil.use_row()
+
+    def op():
+        ceil[3] = COLOR
+
+    return op
+
+
+def _cartesian(ceil) -> Callable[[], Any]:
+    ceil.use_cartesian(0.05)
+
+    def op():
+        ceil[0.3, 0.6] = COLOR
+
+    return op
+
+
+def _cartesian_box(ceil) -> Callable[[], Any]:
+    ceil.use_cartesian(0.05)
+
+    def op():
+        ceil[(0.1, 0.1):(0.4, 0.4)] = COLOR
+
+    return op
+
+
+def _float_cartesian(ceil) -> Callable[[], Any]:
+    ceil.use_float_cartesian(0.1)
+
+    def op():
+        ceil[[0.3, 0.6]] = COLOR
+
+    return op
+
+
+def _polar(ceil) -> Callable[[], Any]:
+    ceil.use_polar([0.5, 0.5], 0.05)
+
+    def op():
+        ceil[0.3, 1.0] = COLOR
+
+    return op
+
+
+def _polar_array(ceil) -> Callable[[], Any]:
+    ceil.use_polar([0.5, 0.5], 0.05)
+    r = np.linspace(0, 0.5, 100)
+    theta = np.linspace(0, 4 * np.pi, 100)
+
+    def op():
+        ceil[r, theta] = COLOR
+
+    return op
+
+
+def _float_polar(ceil) -> Callable[[], Any]:
+    ceil.use_float_polar([0.5, 0.5], 0.1)
+
+    def op():
+        ceil[0.3, 1.0] = COLOR
+
+    return op
+
+
+def _polar_conversion(ceil) -> Callable[[], Any]:
+    from backend.coordinate_conversions import polar
+
+    return lambda: polar(0.3, [1.0], [0.5, 0.5])
+
+
+def _polar_many_conversion(ceil) -> Callable[[], Any]:
+    from backend.coordinate_conversions import polar_many
+
+    rho = np.linspace(0, 0.5, 1024)
+    theta = np.linspace(0, 2 * np.pi, 1024)
+    return lambda: polar_many(rho, theta, [0.5, 0.5])
+
+
+def _hex_to_rgb(ceil) -> Callable[[], Any]:
+    from backend.util import hex_to_rgb
+
+    return lambda: hex_to_rgb("#ff8800")
+
+
+def _interpolate_colors(ceil) -> Callable[[], Any]:
+    from backend.util import interpolate_colors
+
+    return lambda: interpolate_colors("#ff0000", "#0000ff", 0.3)
+
+
+def _color_range(ceil) -> Callable[[], Any]:
+    from backend.util import color_range
+
+    return lambda: color_range("#ff0000", "#0000ff", 100)
+
+
+def _dim_color_by_amount(ceil) -> Callable[[], Any]:
+    from backend.util import dim_color_by_amount
+
+    # results are cached, so this is the cost of dimming a color seen before
+    return lambda: dim_color_by_amount("#ff8800", 0.3)
+
+
+def _dim_color_by_amount_uncached(ceil) -> Callable[[], Any]:
+    from backend.util import dim_color_by_amount
+
+    return lambda: dim_color_by_amount.__wrapped__("#ff8800", 0.3)
+
+
+BENCHMARKS: Dict[str, Setup] = {
+    "ceiling.set_by_index": _set_by_index,
+    "ceiling.show_headless": _show_headless,
+    "ceiling.show_per_light": _show_per_light,
+    "ceiling.set_decreasing_intensity_merge": _set_decreasing_intensity_merge,
+    "indexing.linear": _linear,
+    "indexing.linear_slice": _linear_slice,
+    "indexing.row": _row,
+    "indexing.row_whole": _row_whole,
+    "indexing.cartesian": _cartesian,
+    "indexing.cartesian_box": _cartesian_box,
+    "indexing.float_cartesian": _float_cartesian,
+    "indexing.polar": _polar,
+    "indexing.polar_array": _polar_array,
+    "indexing.float_polar": _float_polar,
+    "coordinate_conversions.polar": _polar_conversion,
+    "coordinate_conversions.polar_many": _polar_many_conversion,
+    "util.hex_to_rgb": _hex_to_rgb,
+    "util.interpolate_colors": _interpolate_colors,
+    "util.color_range": _color_range,
+    "util.dim_color_by_amount": _dim_color_by_amount,
+    "util.dim_color_by_amount_uncached": _dim_color_by_amount_uncached,
+}
+
+
+def run_benchmarks(name_filter: Optional[str] = None) -> Dict[str, Any]:
+    """Times every benchmark whose name contains `name_filter`.
+    Benchmarks that can't run here, like ones needing the light arrangement bindings, are
+    reported with the reason they were skipped"""
+    ceil = _create_ceiling()
+    results: Dict[str, Any] = {}
+    for name, setup in BENCHMARKS.items():
+        if name_filter is not None and name_filter not in name:
+            continue
+        try:
+            results[name] = _time(setup(ceil))
+        except ImportError as e:
+            results[name] = {"skipped": str(e)}
+        print(_describe(name, results[name]), file=sys.stderr)
+
+    return {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> List[Tuple[str, str, Optional[float]]]:
+    """(name, verdict, new time / baseline time) of each benchmark, where the verdict is
+    "regression", "improvement", "same", or "new" when the baseline doesn't have it"""
+    comparison = []
+    for name, result in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if "ns" not in result or base is None or "ns" not in base:
+            comparison.append((name, "new", None))
+            continue
+        ratio = result["ns"] / base["ns"]
+        if ratio > 1 + threshold:
+            verdict = "regression"
+        elif ratio < 1 - threshold:
+            verdict = "improvement"
+        else:
+            verdict = "same"
+        comparison.append((name, verdict, ratio))
+    return comparison
+
+
+def _create_ceiling():
+    from backend.ceiling import Ceiling
+    from backend.settings import preprocess_arrangement_file
+
+    arrangement_file = os.path.join(ROOT, ARRANGEMENT_FILE)
+    dimensions, number_lights = preprocess_arrangement_file(arrangement_file)
+    return Ceiling(
+        type="null",
+        rows=ROWS,
+        number_lights=number_lights,
+        dimensions=dimensions,
+        arrangement_file=arrangement_file,
+        number_children_for_division=75,
+    )
+
+
+def _time(op: Callable[[], Any]) -> Dict[str, Any]:
+    # once first, so compiling and filling caches isn't timed
+    op()
+    timer = timeit.Timer(op)
+    number, _ = timer.autorange()
+    times = timer.repeat(repeat=REPEATS, number=number)
+    return {
+        "ns": min(times) / number * 1e9,
+        "median_ns": float(np.median(times)) / number * 1e9,
+        "number": number,
+    }
+
+
+def _describe(name: str, result: Dict[str, Any]) -> str:
+    if "skipped" in result:
+        return "%-42s skipped: %s" % (name, result["skipped"])
+    return "%-42s %12.0f ns" % (name, result["ns"])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filter", help="only run benchmarks whose names contain this")
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="save the results as the baseline instead of comparing against it",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="fraction slower than the baseline that counts as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.filter)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print("saved baseline to %s" % args.baseline, file=sys.stderr)
+        return
+
+    if not os.path.exists(args.baseline):
+        print("no baseline at %s to compare against" % args.baseline, file=sys.stderr)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    comparison = compare(results, baseline, args.threshold)
+    for name, verdict, ratio in comparison:
+        change = "" if ratio is None else "%+.1f%%" % ((ratio - 1) * 100)
+        print("%-42s %-12s %s" % (name, verdict, change))
+
+    if any(verdict == "regression" for _, verdict, _ in comparison):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
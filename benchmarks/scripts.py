@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+"""
+Runs light scripts headless for a fixed number of frames on each arrangement and reports how
+fast they ran as JSON.
+
+```
+python -m benchmarks.scripts                          # every script, every arrangement
+python -m benchmarks.scripts example/example_wave.py --frames 600 --output wave.json
+```
+
+Each (script, arrangement) pair runs in its own process so peak memory use isn't shared
+between runs. The rows in the settings file are used on the arrangement it is for; scripts that
+address lights by row are skipped on the other arrangements.
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import glob
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Repository root, which scripts are run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SETTINGS = "settings.toml"
+
+ARRANGEMENT_FILES = [
+    "settings/zigzag200.csv",
+    "settings/thousand.csv",
+    "settings/tenthousand.csv",
+]
+SCRIPT_GLOBS = ["scripts/light_scripts/*.py", "example/*.py"]
+
+DEFAULT_FRAMES = 300
+# Frames run before measuring, so compiling and filling caches isn't counted
+DEFAULT_WARMUP = 30
+DEFAULT_COLOR = "#ff8800"
+DEFAULT_INTERVAL = 2.0
+# Seconds a single run can take before it is given up on
+RUN_TIMEOUT = 600
+
+
+def benchmark_script(
+    path: str,
+    arrangement_file: str,
+    frames: int = DEFAULT_FRAMES,
+    warmup: int = DEFAULT_WARMUP,
+    color: str = DEFAULT_COLOR,
+    interval: float = DEFAULT_INTERVAL,
+    rows: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """Runs the script at `path` on a headless ceiling in this process and measures it.
+    Scripts that end before `warmup` + `frames` frames are measured over the frames they showed.
+    Scripts that need rows when `rows` is None are reported as skipped
+    """
+    from backend.ceiling import Ceiling
+    from backend.files import parse_script_name_from_file
+    from backend.frame_stats import percentiles_ms
+    from backend.headless_arrangement import FrameLimitReached
+    from backend.row_layout import NoRowsError
+    from backend.script_worker import load_script_function
+    from backend.settings import preprocess_arrangement_file
+
+    result: Dict[str, Any] = {
+        "script": path,
+        "name": parse_script_name_from_file(path),
+        "arrangement": arrangement_file,
+        "error": None,
+    }
+
+    start_ns = time.monotonic_ns()
+    dimensions, number_lights = preprocess_arrangement_file(arrangement_file)
+    ceiling = Ceiling(
+        type="null",
+        rows=rows,
+        number_lights=number_lights,
+        dimensions=dimensions,
+        arrangement_file=arrangement_file,
+        number_children_for_division=75,
+        frame_limit=warmup + frames,
+        time_frames=frames + 1,
+    )
+    result["lights"] = number_lights
+    result["setup_ms"] = (time.monotonic_ns() - start_ns) / 1e6
+
+    f = load_script_function(path)
+    if f is None:
+        result["error"] = "failed to load"
+        return result
+
+    np.random.seed(0)
+    random.seed(0)
+    try:
+        f(ceiling=ceiling, color=color, interval=interval)
+    except (FrameLimitReached, SystemExit):
+        pass
+    except NoRowsError:
+        result["skipped"] = "arrangement has no rows"
+        return result
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+
+    arrangement = ceiling.light_arrangement
+    times_ns = arrangement.show_times_ns()
+    # frames from the end of the warm up on, or every frame if the script ended during it
+    measured = arrangement.frames_shown() - warmup
+    if measured > 0:
+        times_ns = times_ns[max(0, len(times_ns) - measured - 1) :]
+    frame_ns = np.diff(times_ns)
+
+    result["frames"] = len(frame_ns)
+    result["fps"] = (
+        len(frame_ns) * 1e9 / (times_ns[-1] - times_ns[0])
+        if len(frame_ns) > 0 and times_ns[-1] > times_ns[0]
+        else None
+    )
+    result["frame_ms"] = percentiles_ms(frame_ns)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def arrangement_rows(
+    arrangement_file: str, settings_file: str = DEFAULT_SETTINGS
+) -> Optional[List[int]]:
+    """`rows` from the settings file if it is the settings for `arrangement_file`, else None"""
+    import toml
+
+    settings = toml.load(os.path.join(ROOT, settings_file))["settings"]
+    if os.path.normpath(settings["arrangement_file"]) != os.path.normpath(
+        arrangement_file
+    ):
+        return None
+    return settings.get("rows")
+
+
+def run_benchmarks(
+    scripts: List[str],
+    arrangement_files: List[str],
+    frames: int = DEFAULT_FRAMES,
+    warmup: int = DEFAULT_WARMUP,
+    settings_file: str = DEFAULT_SETTINGS,
+) -> Dict[str, Any]:
+    """Benchmarks every script on every arrangement, each in a new process"""
+    results = []
+    for arrangement_file in arrangement_files:
+        for path in scripts:
+            results.append(
+                _run_in_process(path, arrangement_file, frames, warmup, settings_file)
+            )
+            print(_describe(results[-1]), file=sys.stderr)
+
+    return {
+        "frames": frames,
+        "warmup": warmup,
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "results": results,
+    }
+
+
+def _run_in_process(
+    path: str, arrangement_file: str, frames: int, warmup: int, settings_file: str
+) -> Dict[str, Any]:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.scripts",
+        "--single",
+        path,
+        "--arrangements",
+        arrangement_file,
+        "--frames",
+        str(frames),
+        "--warmup",
+        str(warmup),
+        "--settings",
+        settings_file,
+    ]
+    failed = {"script": path, "arrangement": arrangement_file}
+    try:
+        process = subprocess.run(
+            command, cwd=ROOT, capture_output=True, text=True, timeout=RUN_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        return failed | {"error": "timed out after %d s" % RUN_TIMEOUT}
+
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        return failed | {
+            "error": lines[-1] if lines else "exited with %d" % process.returncode
+        }
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _describe(result: Dict[str, Any]) -> str:
+    if "skipped" in result:
+        return "%s on %s: skipped, %s" % (
+            result["script"],
+            result["arrangement"],
+            result["skipped"],
+        )
+    if result.get("error") is not None and result.get("fps") is None:
+        return "%s on %s: %s" % (
+            result["script"],
+            result["arrangement"],
+            result["error"],
+        )
+    return "%s on %s: %.1f fps, p99 %.2f ms, %.0f MB" % (
+        result["script"],
+        result["arrangement"],
+        result["fps"] or 0,
+        result["frame_ms"].get("p99", 0),
+        result["peak_rss_mb"],
+    )
+
+
+def _default_scripts() -> List[str]:
+    scripts = []
+    for pattern in SCRIPT_GLOBS:
+        scripts += sorted(
+            os.path.relpath(path, ROOT)
+            for path in glob.glob(os.path.join(ROOT, pattern))
+            if os.path.basename(path) != "__init__.py"
+        )
+    return scripts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scripts", nargs="*", help="scripts to run, all by default")
+    parser.add_argument("--arrangements", nargs="+", default=ARRANGEMENT_FILES)
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument(
+        "--settings",
+        default=DEFAULT_SETTINGS,
+        help="settings file whose rows are used on its arrangement",
+    )
+    parser.add_argument("--output", help="file to write the JSON to, stdout by default")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single is not None:
+        # one run, in the process started by `_run_in_process`
+        arrangement_file = args.arrangements[0]
+        result = benchmark_script(
+            args.single,
+            arrangement_file,
+            args.frames,
+            args.warmup,
+            rows=arrangement_rows(arrangement_file, args.settings),
+        )
+        print(json.dumps(result))
+        return
+
+    report = run_benchmarks(
+        args.scripts or _default_scripts(),
+        args.arrangements,
+        args.frames,
+        args.warmup,
+        args.settings,
+    )
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
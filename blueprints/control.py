@@ -1,28 +1,31 @@
-from multiprocess import Process
-from typing import Callable, Optional
-import importlib.util as importlib_util
+from typing import Optional, Tuple
 import json
 import numpy as np
 import os
-import random
-import signal
-import colour
-import time
-import logging, logging.handlers
 from flask import Blueprint, request, current_app
-from backend.ceiling_animation import circle_clear, circle_clear_soft, fade_out
-from backend.constants import SCRIPT_LOGFILE_NAME, SCRIPT_LOGGER_NAME
 
+from backend import startup_profile
 from backend.state import global_state as state
-from backend.ceiling import Ceiling
 from backend.files import *
+from backend.request_coalescer import RequestCoalescer
+from backend.script_parameters import parse_color
+from backend.script_worker import TRANSITION_START, TRANSITION_COLOR_CHANGE
 
 bp = Blueprint("control", __name__, url_prefix="/control")
 
-# Transition Types
-TRANSITION_START = "start"
-TRANSITION_STOP = "start"
-TRANSITION_COLOR_CHANGE = "color_change"
+# Runs control requests one at a time. Color pickers send many requests while dragging, so
+# only the newest waiting request of each kind is applied. Starting and stopping share a key
+# since either replaces the other
+coalescer = RequestCoalescer()
+SCRIPT_REQUEST = "script"
+COLOR_REQUEST = "color"
+BRIGHTNESS_REQUEST = "brightness"
+INTERVAL_REQUEST = "interval"
+
+# How long a color change waits for a newer one before being applied
+COLOR_DEBOUNCE = 0.01
+
+COALESCED_RESPONSE = json.dumps({"ok": True, "coalesced": True})
 
 
 @bp.route("/start", methods=["POST"])
@@ -45,6 +48,8 @@ def start_script() -> str:
     file_to_run = data_dict["file"]
 
     color = data_dict.get("color")
+    if color is not None and not _is_color(color):
+        return _invalid_color_response(color)
 
     interval = data_dict.get("interval")
     interval = float(interval) if interval else None
@@ -67,10 +72,17 @@ def start_script() -> str:
             {"ok": False, "error": ("path doesn't exist: %s" % file_to_run)}
         )
 
-    with state.lock:
-        res = _start_script(file_to_run, color, interval, brightness, TRANSITION_START)
+    res = coalescer.submit(
+        SCRIPT_REQUEST,
+        lambda: _start_script(
+            file_to_run, color, interval, brightness, TRANSITION_START
+        ),
+    )
 
-    if res:
+    if res is None:
+        current_app.logger.info("start of %s replaced by a newer request", file_to_run)
+        return COALESCED_RESPONSE
+    elif res:
         current_app.logger.info("succesfully started running script %s!", file_to_run)
         return json.dumps({"ok": True})
     else:
@@ -89,12 +101,28 @@ def start_script() -> str:
 def stop_script() -> str:
     current_app.logger.info('Running "stop script" route function')
 
-    with state.lock:
-        _stop_script()
-
+    if coalescer.submit(SCRIPT_REQUEST, _stop_script) is None:
+        return COALESCED_RESPONSE
     return json.dumps({"ok": True})
 
 
+@bp.route("/stats", methods=["GET"])
+def get_stats() -> str:
+    """
+    Frame timings of the running script: achieved fps, percentiles of frame, render and show
+    times in milliseconds, and how many frames overran their time or were dropped
+    """
+    return json.dumps({"ok": True, "stats": state.frame_stats.summary()})
+
+
+@bp.route("/startup", methods=["GET"])
+def get_startup() -> str:
+    """
+    How long each phase of starting the website took, in milliseconds
+    """
+    return json.dumps({"ok": True, "startup": startup_profile.report()})
+
+
 @bp.route("/color", methods=["POST"])
 def change_color() -> str:
     """
@@ -116,12 +144,18 @@ def change_color() -> str:
     if color is None:
         current_app.logger.debug("Color was None so returning error json response")
         return json.dumps({"ok": False, "error": "request body requires arg for color"})
+    # checked before queueing, so a bad color is a 400 rather than an error in the worker lock
+    if not _is_color(color):
+        return _invalid_color_response(color)
 
-    with state.lock:
-        current_app.logger.info("Changing color of script to %s", color)
-        res = _change_color(color)
+    res = coalescer.submit(
+        COLOR_REQUEST, lambda: _change_color(color), debounce=COLOR_DEBOUNCE
+    )
 
-    if res:
+    if res is None:
+        current_app.logger.debug("color %s replaced by a newer request", color)
+        return COALESCED_RESPONSE
+    elif res:
         return json.dumps({"ok": True})
     else:
         return json.dumps(
@@ -132,6 +166,85 @@ def change_color() -> str:
         )
 
 
+@bp.route("/interval", methods=["POST"])
+def change_interval() -> str:
+    """
+    Changes the interval of the currently running script
+    expects one arg for interval, in seconds
+    """
+    data_dict = request.json
+    if type(data_dict) is not dict or data_dict.get("interval") is None:
+        return json.dumps(
+            {"ok": False, "error": "request body requires arg for interval"}
+        )
+
+    try:
+        interval = float(data_dict["interval"])
+    except (TypeError, ValueError):
+        interval = 0.0
+    if not interval > 0:
+        return (
+            json.dumps(
+                {
+                    "ok": False,
+                    "error": ("invalid interval: %s" % data_dict["interval"]),
+                }
+            ),
+            400,
+        )
+
+    res = coalescer.submit(
+        INTERVAL_REQUEST,
+        lambda: _change_interval(interval),
+        debounce=COLOR_DEBOUNCE,
+    )
+    if res is None:
+        return COALESCED_RESPONSE
+    elif res:
+        return json.dumps({"ok": True})
+    else:
+        return json.dumps(
+            {"ok": False, "error": ("unable to change interval to %s" % interval)}
+        )
+
+
+@bp.route("/brightness", methods=["POST"])
+def change_brightness() -> str:
+    """
+    Changes the brightness of the lights without restarting the running script
+    expects one arg for brightness, 0..255
+    """
+    data_dict = request.json
+    if type(data_dict) is not dict or data_dict.get("brightness") is None:
+        return json.dumps(
+            {"ok": False, "error": "request body requires arg for brightness"}
+        )
+
+    brightness = int(np.clip(int(data_dict["brightness"]), 0, 255))
+
+    res = coalescer.submit(
+        BRIGHTNESS_REQUEST,
+        lambda: _change_brightness(brightness),
+        debounce=COLOR_DEBOUNCE,
+    )
+    if res is None:
+        return COALESCED_RESPONSE
+    return json.dumps({"ok": True})
+
+
+def _is_color(color: str) -> bool:
+    try:
+        parse_color(color)
+        return True
+    except ValueError:
+        return False
+
+
+def _invalid_color_response(color: str) -> Tuple[str, int]:
+    current_app.logger.info("invalid color %s", color)
+    return json.dumps({"ok": False, "error": ("invalid color: %s" % color)}), 400
+
+
 def _start_script(
     path: str,
     color_arg: Optional[str],
@@ -139,25 +252,20 @@ def _start_script(
     brightness: int,
     transition_type: str,
 ) -> bool:
-    """Creates a new process to run the ceiling script.
-    Returns True if it succesfully started the process."""
-    # Stop running script
-    if state.current_process is not None:
-        state.current_process.terminate()
-        state.current_process.join()
+    """Sends the script to the script worker to run, replacing the running script.
+    Returns True if it succesfully started the script."""
+    worker = state.script_worker()
+    if not worker.run_script(
+        path, color_arg, interval_arg, brightness, transition_type
+    ):
+        print("Script crashed when loaded as a module")
+        state.current_pattern = None
+        state.current_script_path = None
+        return False
 
     # Update brightness
     state.settings.brightness = brightness
 
-    # Load new script
-    script = runnable_script(path, color_arg, interval_arg, transition_type)
-    if script is None:
-        print("Script crashed when loaded as a module")
-        return False
-
-    # Start new script
-    state.current_process = script
-    state.current_process.start()
     state.current_pattern = parse_script_name_from_file(path)
 
     state.current_script_path = path
@@ -168,119 +276,86 @@ def _start_script(
     return True
 
 
-def _stop_script() -> None:
-    """Stops currently running script, waiting for it to return the `Ceiling` object"""
-    if state.current_process:
-        state.current_process.terminate()
-        state.current_process.join()
-        state.current_process = None
+def _stop_script() -> bool:
+    """Stops currently running script, leaving the script worker ready for the next one.
+    Always returns True"""
+    if state.current_script_path is not None:
+        if state.worker is not None:
+            state.worker.stop_script()
         state.current_pattern = None
 
         state.current_script_path = None
         state.current_color = None
         state.current_interval = None
         state.current_brightness = None
+    return True
 
 
-def _change_color(color: str) -> bool:
-    "Changes the color of the currently running script to `color`"
+def _change_brightness(brightness: int) -> bool:
+    """Changes the brightness of the lights; picked up by the running script's next frame"""
+    current_app.logger.info("Changing brightness to %s", brightness)
+    state.settings.brightness = brightness
+    if state.current_script_path is not None:
+        state.current_brightness = brightness
+        state.script_parameters.update(brightness=brightness)
+    return True
+
+
+def _change_interval(interval: float) -> bool:
+    "Changes the interval of the currently running script to `interval`"
+    current_app.logger.info("Changing interval of script to %s", interval)
 
     if state.current_script_path is None:
         return True
 
+    # scripts that pick up changes while running don't need to be restarted
+    if (
+        state.worker is not None
+        and state.worker.is_running()
+        and state.script_parameters.accepts_updates()
+    ):
+        state.script_parameters.update(interval=interval)
+        state.current_interval = interval
+        return True
+
     current_script_path = state.current_script_path
-    current_interval = state.current_interval
+    current_color = state.current_color
     current_brightness = state.current_brightness
     _stop_script()
     return _start_script(
         current_script_path,
-        color,
-        current_interval,
+        current_color,
+        interval,
         current_brightness,
-        TRANSITION_COLOR_CHANGE,
+        TRANSITION_START,
     )
 
 
-def function_wrapper(
-    f: Callable, transition_type: str, logging_level: str
-) -> Callable[[str, float], None]:
-    """Wraps the function in another function that doesn't use keyword arguements.
-    Also catches interrupts from `process.terminate()` to distinguish from actually crashing
-    """
-
-    def _exit_gracefully(sig_number, stack_frame):
-        exit(0)
-
-    def _function_wrapper(color: str, interval: float):
-        signal.signal(signal.SIGTERM, _exit_gracefully)
-
-        FORMAT = "%(asctime)-15s %(message)s"
-        # rotate after 2GB
-        handler = logging.handlers.RotatingFileHandler(
-            SCRIPT_LOGFILE_NAME, maxBytes=1024 * 1024 * 1024 * 2, backupCount=3
-        )
-        logging.basicConfig(
-            format=FORMAT,
-            level=logging.INFO,
-            datefmt="%Y-%m-%d %H:%M:%S",
-            handlers=[handler],
-        )
-        logging.getLogger(SCRIPT_LOGGER_NAME).setLevel(logging_level)
-
-        try:
-            now = int(time.time())
-            np.random.seed(now)
-            random.seed(now)
-            ceiling = state.create_ceiling()
-            if transition_type == TRANSITION_COLOR_CHANGE:
-                fade_out(ceiling, 0.2)
-            elif transition_type == TRANSITION_START:
-                circle_clear_soft(ceiling, 0.8, colour.Color("white"))
-            f(ceiling=ceiling, color=color, interval=interval)
-        except Exception as e:
-            logging.getLogger(SCRIPT_LOGGER_NAME).error(
-                "Error occured when running the script!!!"
-            )
-            logging.getLogger(SCRIPT_LOGGER_NAME).error("Error:\n%s", e)
-            print(e)
-            exit(1)
-        else:
-            pass
-
-    return _function_wrapper
-
-
-def runnable_script(
-    file: str,
-    color_arg: Optional[str],
-    interval_arg: Optional[float],
-    transition_type: str,
-) -> Optional[Process]:
-    """
-    Converts a path to a file to a process containing the function
-    Function in the file should be called "run(**kwargs)"
-
-    Also wraps the function in code that will pass the ceiling between the script process and this process
-    """
-    spec = importlib_util.spec_from_file_location("script_func", file)
-    if spec is None:
-        return None
+def _change_color(color: str) -> bool:
+    "Changes the color of the currently running script to `color`"
+    current_app.logger.info("Changing color of script to %s", color)
 
-    mod = importlib_util.module_from_spec(spec)
+    if state.current_script_path is None:
+        return True
 
-    spec_loader = spec.loader
-    if spec_loader is None:
-        return None
+    # scripts that pick up changes while running don't need to be restarted
+    if (
+        state.worker is not None
+        and state.worker.is_running()
+        and state.script_parameters.accepts_updates()
+    ):
+        state.script_parameters.update(color=color)
+        state.current_color = color
+        return True
 
-    try:
-        spec_loader.exec_module(mod)
-    except:  # Script fails to execute
-        return None
-
-    f = function_wrapper(mod.run, transition_type, "DEBUG")
-    process = Process(
-        target=f,
-        args=(color_arg, interval_arg),
+    current_script_path = state.current_script_path
+    current_interval = state.current_interval
+    current_brightness = state.current_brightness
+    _stop_script()
+    return _start_script(
+        current_script_path,
+        color,
+        current_interval,
+        current_brightness,
+        TRANSITION_COLOR_CHANGE,
     )
-
-    return process
@@ -0,0 +1,82 @@
+from typing import Any, Dict, Optional
+import numpy as np
+from flask import request
+from flask_socketio import Namespace
+
+from backend.frame_preview import delta_encode
+from backend.settings import load_arrangement_positions
+from backend.state import global_state as state
+
+# How often frames are sent to browsers
+PREVIEW_FPS = 10
+# Send the whole frame every this many frames, so clients that missed a delta recover
+KEYFRAME_INTERVAL = 50
+
+
+class PreviewNamespace(Namespace):
+    """
+    Streams the frames the running script shows to browsers over SocketIO.
+
+    Clients first get a `layout` event with the position of every light, then `frame` events
+    with the lights that changed since the last frame (see `delta_encode`) at most
+    `PREVIEW_FPS` times a second. Frames are read from shared memory, so streaming never waits
+    on the script.
+    """
+
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        self._clients = 0
+        self._streaming = False
+        self._send_keyframe = True
+        self._layout: Optional[Dict[str, Any]] = None
+
+    def on_connect(self) -> None:
+        self._clients += 1
+        self._send_keyframe = True
+        self.emit("layout", self._light_layout(), room=request.sid)  # type: ignore
+        if not self._streaming:
+            self._streaming = True
+            self.socketio.start_background_task(self._stream)
+
+    def on_disconnect(self, *args) -> None:
+        self._clients -= 1
+
+    def _light_layout(self) -> Dict[str, Any]:
+        if self._layout is None:
+            positions = load_arrangement_positions(
+                state.settings.arrangement_file, state.settings.number_lights
+            )
+            xy = np.zeros((len(positions), 2), dtype="<f4")
+            xy[:, : min(2, positions.shape[1])] = positions[:, :2]
+            self._layout = {
+                "number_lights": len(positions),
+                "positions": xy.tobytes(),
+            }
+        return self._layout
+
+    def _stream(self) -> None:
+        preview = state.frame_preview
+        frame = np.empty((preview.number_lights(), 3), dtype=np.uint8)
+        previous = np.empty_like(frame)
+        last_number = -1
+        since_keyframe = 0
+
+        while True:
+            self.socketio.sleep(1 / PREVIEW_FPS)
+            if self._clients <= 0 or preview.frames_written() - 1 == last_number:
+                continue
+
+            latest = preview.latest(out=frame)
+            if latest is None:
+                continue
+            last_number = latest[0]
+
+            keyframe = self._send_keyframe or since_keyframe >= KEYFRAME_INTERVAL
+            message = delta_encode(frame, None if keyframe else previous)
+            message["number"] = last_number
+            if message["keyframe"] or message["indices"]:
+                self.emit("frame", message)
+
+            self._send_keyframe = False
+            since_keyframe = 0 if message["keyframe"] else since_keyframe + 1
+            frame, previous = previous, frame
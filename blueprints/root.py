@@ -1,20 +1,32 @@
+import hashlib
 import json
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from flask import (
     Blueprint,
+    Response,
+    make_response,
     render_template,
     request,
 )
 
 from backend.state import global_state as state
 from backend.files import *
+from backend.script_worker import ScriptStatus
 
 bp = Blueprint("root", __name__, url_prefix="/")
 
 
 @bp.route("/")
-def route_main():
-    return render_template("index.html", patterns=ls, url=state.settings.url)
+def route_main() -> Response:
+    catalog.refresh()
+    global _page
+    if _page is None or _page[0] != catalog.etag():
+        html = render_template(
+            "index.html", patterns=catalog.scripts(), url=state.settings.url
+        )
+        # the page also changes with the template, so it gets its own tag
+        _page = (catalog.etag(), hashlib.sha1(html.encode()).hexdigest()[:16], html)
+    return _conditional(_page[2], _page[1])
 
 
 @bp.route("/state")
@@ -26,37 +38,53 @@ def get_state() -> str:
     GRACEFULLY_TERMINATED: the script ran and ended without crashing
     CRASHED: the script crashed
     """
-    if state.current_process is None:
+    if state.worker is None or state.current_script_path is None:
         return json.dumps({"state": "NOT_RUNNING"})
 
-    exit_code = state.current_process.exitcode
+    status = state.worker.status()
 
     result = ""
     pattern = "N/A"
-    if exit_code is None:
+    if status == ScriptStatus.RUNNING:
         result = "RUNNING"
         pattern = state.current_pattern
-    elif exit_code == 0:
+    elif status == ScriptStatus.FINISHED:
         result = "GRACEFULLY_TERMINATED"
         pattern = state.current_pattern
-    else:
+    elif status == ScriptStatus.CRASHED:
         result = "CRASHED"
         pattern = state.current_pattern
+    else:
+        return json.dumps({"state": "NOT_RUNNING"})
 
     return json.dumps({"state": result, "pattern": pattern})
 
 
 @bp.route("/scripts")
-def get_scripts() -> str:
-    script_and_names: List[Dict[str, str]] = []
-    for t in script_names:
-        script_and_names += [{"script": t[1], "name": t[0]}]
+def get_scripts() -> Response:
+    catalog.refresh()
+    global _scripts_json
+    if _scripts_json is None or _scripts_json[0] != catalog.etag():
+        script_and_names: List[Dict[str, str]] = []
+        for t in catalog.scripts():
+            script_and_names += [{"script": t[1], "name": t[0]}]
+        _scripts_json = (catalog.etag(), json.dumps({"results": script_and_names}))
 
-    return json.dumps({"results": script_and_names})
+    return _conditional(_scripts_json[1], _scripts_json[0])
 
 
 # ========================================
 
-script_names = get_scripts_and_names("scripts/light_scripts")
+# Scripts that can be run, rescanned when they change
+catalog = ScriptCatalog(SCRIPTS_PATH)
+
+# (etag, body) of the last responses, reused until the scripts change
+_page: Optional[Tuple[str, str, str]] = None
+_scripts_json: Optional[Tuple[str, str]] = None
+
 
-ls = script_names
+def _conditional(body: str, etag: str) -> Response:
+    """Responds with `body`, or 304 Not Modified if the client already has this version"""
+    response = make_response(body)
+    response.set_etag(etag)
+    return response.make_conditional(request)
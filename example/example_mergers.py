@@ -6,11 +6,11 @@
 import time
 from typing import Optional, Union
 import numpy as np
-import colour
 
 from backend.ceiling import Ceiling
+from backend.colorspace import hsl_to_rgb, rotate_hue
 from backend.state import State
-from backend.util import colour_rgb_to_neopixel_rgb, rotate_vector
+from backend.util import rotate_vector
 from scripts.library.render import RenderState
 
 
@@ -19,8 +19,9 @@ class Render(RenderState):
         self.offset_1 = np.random.random()
         self.offset_2 = np.random.random()
 
-        self.col_1 = colour.Color(hsl=(self.offset_1, 1, 0.5))
-        self.col_2 = colour.Color(hsl=(self.offset_2, 1, 0.5))
+        self.colors = hsl_to_rgb(
+            np.array([[self.offset_1, 1, 0.5], [self.offset_2, 1, 0.5]])
+        )
 
         self.point_1 = np.array([0.5, 0.5])
         self.velocity_1 = np.array([1.0, 0]) * (1 / interval)
@@ -48,16 +49,11 @@ class Render(RenderState):
         if self.point_2[1] < 0 or self.point_2[1] > 1:
             self.velocity_2[1] = -self.velocity_2[1]
 
-        self.col_1.set_hue(self.progress() + self.offset_1)
-        self.col_2.set_hue(self.progress() + self.offset_2)
+        col_1, col_2 = rotate_hue(self.colors, self.progress())
 
         ceil.clear()
-        ceil[self.point_1[0], self.point_1[1]] = colour_rgb_to_neopixel_rgb(
-            self.col_1.rgb
-        )
-        ceil[self.point_2[0], self.point_2[1]] = colour_rgb_to_neopixel_rgb(
-            self.col_2.rgb
-        )
+        ceil[self.point_1[0], self.point_1[1]] = col_1
+        ceil[self.point_2[0], self.point_2[1]] = col_2
         ceil.show()
 
         return super().render(delta, ceil)
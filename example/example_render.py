@@ -2,6 +2,7 @@
 
 # NAME: render example
 
+import numpy as np
 from typing import Optional, Union
 from backend.ceiling import Ceiling
 from backend.state import State
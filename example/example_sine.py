@@ -11,8 +11,8 @@ from backend.backend_types import RGB
 
 from backend.ceiling import Ceiling
 from backend.util import (
+    Palette,
     color_format_to_obj,
-    color_range,
     dim_color,
 )
 from scripts.library.render import RenderState
@@ -32,15 +32,14 @@ class Render(RenderState):
 
         color4 = dim_color(color)
 
-        self.colors = color_range(color1, color2, 10)
-        self.colors += color_range(color2, color3, 10)
-        self.colors += color_range(color3, color4, 10)
-        self.colors += color_range(color4, color1, 10)
+        self.colors = Palette([color1, color2, color3, color4], cyclic=True)
 
         self.color_progress = 0.0
 
         self.COLOR_RANGE = 0.2  # percentage of self.colors to use at once
         self.NUM_POINTS = 50
+        # where each point is along the line, 0..1
+        self.offsets = np.arange(self.NUM_POINTS) / self.NUM_POINTS
         super().__init__(interval * 4)
 
     def render(self, delta: float, ceil: Ceiling) -> Union[bool, None]:
@@ -48,18 +47,16 @@ class Render(RenderState):
 
         self.color_progress = (self.color_progress + (delta / 15)) % 1
 
-        base_color_index = int(len(self.colors) * self.color_progress)
+        point_colors = self.colors.take(
+            self.color_progress + self.offsets * self.COLOR_RANGE
+        )
 
         for x in range(0, self.NUM_POINTS):
             x_index = x / self.NUM_POINTS
             y_index = np.sin((2 * np.pi) * (self.progress() + (x / self.NUM_POINTS)))
             y_index = (y_index / 2) + 0.5
 
-            color_index = (
-                base_color_index
-                + int((x / self.NUM_POINTS) * (self.COLOR_RANGE * len(self.colors)))
-            ) % len(self.colors)
-            ceil[x_index, y_index] = self.colors[color_index]
+            ceil[x_index, y_index] = point_colors[x]
 
         ceil.show()
 
@@ -15,9 +15,9 @@ from numba import jit
 from backend.ceiling import Ceiling
 from backend.state import State
 from backend.util import (
+    Palette,
     color_format_to_obj,
     color_format_to_rgb,
-    color_range,
     dim_color,
     sigmoid_0_to_1,
 )
@@ -42,19 +42,12 @@ class Render(RenderState):
     def __init__(self, color: colour.Color, interval: Optional[float]):
         assert interval is not None
 
-        color1 = dim_color(copy.deepcopy(color))
-
-        color2 = copy.deepcopy(color)
-
-        color3 = copy.deepcopy(color)
-        color3.hue = (color2.hue + 0.15) % 1
-        color3.luminance = 0.9
-
-        self.colors = color_range(color1, color2, 30)
-        self.colors += color_range(color2, color3, 10)
+        self.set_colors(color)
 
         self.NUM_POINTS = 81
         self.side = int(np.sqrt(self.NUM_POINTS))
+        # How much of the wave the ceiling spans along each axis
+        self.SCALE = self.side / 2
 
         # Lowest Highest x and y moved
         self.MIN_XY = np.array([-500, -500])
@@ -65,24 +58,40 @@ class Render(RenderState):
 
         super().__init__(interval * 500)
 
-    def render(self, delta: float, ceil: Ceiling) -> Union[bool, None]:
-        ceil.clear()
+    def set_colors(self, color: colour.Color) -> None:
+        color1 = dim_color(copy.deepcopy(color))
 
-        x_base = self.progress() * (self.MAX_XY[0] - self.MIN_XY[0]) + self.MIN_XY[0]
-        y_base = self.progress() * (self.MAX_XY[1] - self.MIN_XY[1]) + self.MIN_XY[1]
+        color2 = copy.deepcopy(color)
+
+        color3 = copy.deepcopy(color)
+        color3.hue = (color2.hue + 0.15) % 1
+        color3.luminance = 0.9
+
+        self.colors = Palette([color1, color2, color3], positions=[0, 0.75, 1])
 
-        for i in range(self.side):
-            for j in range(self.side):
-                x = x_base + (i / 2)
-                y = y_base + (j / 2)
+    def parameters_changed(self, ceil: Ceiling) -> None:
+        params = self.parameters()
+        assert params is not None
+        if params.color() is not None:
+            self.set_colors(color_format_to_obj(params.color()))
+        if params.interval() is not None:
+            self.interval = params.interval() * 500
 
-                res = convert_range(
-                    wave_function(x, y), self.RANGE[0], self.RANGE[1], 0, 1
-                )
+    def render(self, delta: float, ceil: Ceiling) -> Union[bool, None]:
+        x_base = self.progress() * (self.MAX_XY[0] - self.MIN_XY[0]) + self.MIN_XY[0]
+        y_base = self.progress() * (self.MAX_XY[1] - self.MIN_XY[1]) + self.MIN_XY[1]
 
-                ceil[i / self.side, j / self.side] = self.colors[
-                    int(res * (len(self.colors)))
-                ]
+        # Sample the wave at every light at once
+        ceil.render_field(
+            lambda x, y, r, theta: convert_range(
+                wave_function(x_base + x * self.SCALE, y_base + y * self.SCALE),
+                self.RANGE[0],
+                self.RANGE[1],
+                0,
+                1,
+            ),
+            self.colors,
+        )
 
         ceil.show()
         return super().render(delta, ceil)
@@ -93,7 +102,6 @@ def run(**kwargs):
     interval = float(kwargs["interval"])
 
     ceil: Ceiling = kwargs["ceiling"]
-    ceil.use_float_cartesian(effect_radius=0.12)
 
     render_loop = Render(color_input, interval)
     render_loop.run(60, ceil)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+from typing import Optional
+import numpy as np
+from numpy._typing import NDArray
+
+# Most memory a frame cache can use by default; longer periods are rendered live instead
+MAX_FRAME_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class FrameCache:
+    """
+    Frames of one period of an animation that only depends on how far it is through its
+    interval, indexed by frame within the period.
+
+    If the period has more frames than fit in `max_bytes`, nothing is cached.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        fps: float,
+        number_lights: int,
+        max_bytes: int = MAX_FRAME_CACHE_BYTES,
+    ):
+        self.interval = interval
+        self._fps = fps
+        # the interval can end a frame late, since it only resets once it has passed
+        number_frames = int(interval * fps) + 2
+        self._frames: Optional[NDArray[np.uint8]] = None
+        self._cached = np.zeros(number_frames, dtype=np.bool_)
+        if number_frames * number_lights * 3 <= max_bytes:
+            self._frames = np.zeros((number_frames, number_lights, 3), dtype=np.uint8)
+
+    def phase(self, elapsed: float) -> int:
+        """Frame within the period `elapsed` seconds into the interval"""
+        return int(round(elapsed * self._fps))
+
+    def get(self, phase: int) -> Optional[NDArray[np.uint8]]:
+        if self._frames is None or not (0 <= phase < len(self._cached)):
+            return None
+        return self._frames[phase] if self._cached[phase] else None
+
+    def store(self, phase: int, frame: NDArray[np.uint8]) -> None:
+        if self._frames is None or not (0 <= phase < len(self._cached)):
+            return
+        self._frames[phase] = frame
+        self._cached[phase] = True
+
+    def clear(self) -> None:
+        self._cached[:] = False
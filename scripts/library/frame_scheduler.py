@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+from enum import Enum
+import time
+
+# How long before a frame is due to stop sleeping and start spinning. Sleeps can overshoot by
+# around a millisecond on a Pi, so spinning for the last stretch keeps frames on time while
+# leaving the CPU free for the rest of the frame
+SPIN_NS = 1_000_000
+
+
+class LateFramePolicy(Enum):
+    """What to do when a frame starts more than a whole frame late"""
+
+    # Render the missed frames back to back until caught up
+    CATCH_UP = 0
+    # Skip the missed frames; the next frame's delta covers the skipped time
+    DROP = 1
+    # Start the schedule over from the late frame, so animations slow down instead of jumping
+    STRETCH = 2
+
+
+class FrameScheduler:
+    """
+    Paces a render loop at a fixed frame rate using the monotonic clock.
+
+    Sleeps until shortly before each frame is due, then spins for the rest so frames start on
+    time without keeping a core busy.
+    """
+
+    def __init__(
+        self,
+        fps: float,
+        late_frame_policy: LateFramePolicy = LateFramePolicy.CATCH_UP,
+        spin_ns: int = SPIN_NS,
+        max_catch_up_frames: int = 30,
+    ):
+        """
+        `max_catch_up_frames`: with `CATCH_UP`, if more frames than this are missed the extra
+        ones are dropped, so one long stall doesn't cause a long burst of frames after it
+        """
+        self.ns_per_frame = int(1_000_000_000 / fps)
+        self.late_frame_policy = late_frame_policy
+        self.spin_ns = spin_ns
+        self.max_catch_up_frames = max_catch_up_frames
+
+        # When the next frame is due
+        self._deadline = time.monotonic_ns()
+
+        # How late the last frame started, and how many frames have been skipped so far
+        self.last_lateness_ns = 0
+        self.frames_dropped = 0
+
+    def wait_for_frame(self) -> int:
+        """Blocks until the next frame is due.
+
+        Returns how many frame periods the frame covers: 1, unless `DROP` skipped frames
+        """
+        now = time.monotonic_ns()
+        remaining = self._deadline - now
+        if remaining > self.spin_ns:
+            time.sleep((remaining - self.spin_ns) / 1_000_000_000)
+        while time.monotonic_ns() < self._deadline:
+            pass
+
+        now = time.monotonic_ns()
+        self.last_lateness_ns = max(0, now - self._deadline)
+        missed = self.last_lateness_ns // self.ns_per_frame
+
+        frames = 1
+        if missed > 0:
+            if self.late_frame_policy == LateFramePolicy.CATCH_UP:
+                if missed > self.max_catch_up_frames:
+                    skipped = missed - self.max_catch_up_frames
+                    self._deadline += skipped * self.ns_per_frame
+                    self.frames_dropped += skipped
+            elif self.late_frame_policy == LateFramePolicy.DROP:
+                self._deadline += missed * self.ns_per_frame
+                self.frames_dropped += missed
+                frames += missed
+            elif self.late_frame_policy == LateFramePolicy.STRETCH:
+                self._deadline = now
+
+        self._deadline += self.ns_per_frame
+        return frames
@@ -7,7 +7,12 @@ import logging
 
 import backend.constants
 from backend.ceiling import Ceiling
+from backend.frame_stats import FrameStats
+from backend.script_interrupt import check_stop
+from backend.script_parameters import ScriptParameters
 from backend.util import clamp
+from scripts.library.frame_cache import MAX_FRAME_CACHE_BYTES, FrameCache
+from scripts.library.frame_scheduler import SPIN_NS, FrameScheduler, LateFramePolicy
 
 RenderLoop = Callable[[float, Ceiling], Union[bool, None]]
 
@@ -15,6 +20,16 @@ RenderLoop = Callable[[float, Ceiling], Union[bool, None]]
 class RenderState(ABC):
     _cur: float = 0
     interval: Optional[float] = None
+    _parameters: Optional[ScriptParameters] = None
+
+    # Set to True when frames only depend on `progress()`, so `run` can render one interval
+    # and replay it after that instead of rendering every frame
+    cache_period: bool = False
+    # Set to False while frames depend on anything else, like state changed in
+    # `interval_reached`, to render live even with `cache_period`
+    periodic: bool = True
+    # Most memory the cached period can use; longer periods are rendered live
+    frame_cache_bytes: int = MAX_FRAME_CACHE_BYTES
 
     @abstractmethod
     def __init__(self, interval: Optional[float]):
@@ -36,35 +51,141 @@ class RenderState(ABC):
             "interval of %s reached", self.interval
         )
 
-    def run(self, fps: float, ceil: Ceiling):
+    def parameters_changed(self, ceil: Ceiling) -> None:
+        """Called between frames when the color, interval or brightness are changed from the
+        website; read the new values with `self.parameters()`.
+
+        Scripts that don't override this are restarted with the new parameters instead
+        """
+
+    def parameters(self) -> Optional[ScriptParameters]:
+        """Parameters set from the website while running, or None outside of `run`"""
+        return self._parameters
+
+    def run(
+        self,
+        fps: float,
+        ceil: Ceiling,
+        late_frame_policy: LateFramePolicy = LateFramePolicy.CATCH_UP,
+        spin_ns: int = SPIN_NS,
+    ):
         """Handles boiler plate of running a render loop at `FPS` frames per second.
 
-        `block` is a function (deltatime, ceiling) -> boolean that should be run
-        every 1 / `FPS` seconds.
+        `render` is called every 1 / `FPS` seconds. Between frames the loop sleeps, only
+        spinning for the last `spin_ns` nanoseconds before a frame is due.
 
-        If `block` returns False, the render loop will end. If `block` returns True (or nothing at all),
-        will continue running in a loop
-        """
-        run = True
-        ns_per_frame = 1000000000 / fps
-        last_frame_time = time.time_ns()
-        delta = 0
+        `late_frame_policy` decides what happens when rendering falls more than a frame behind;
+        see `LateFramePolicy`.
 
-        while run is True or run is None:
-            start_time = time.time_ns()
-            delta += (start_time - last_frame_time) / ns_per_frame
-            last_frame_time = start_time
+        Ceilings that aren't `realtime` don't wait between frames, but `delta` is still
+        1 / `FPS`, so animations play out the same, only faster.
 
-            if delta >= 1:
-                run = self.render(1 / fps, ceil)
+        With `cache_period`, frames rendered during the first interval are kept and shown
+        again in later intervals; `render` is only called for frames that aren't cached. The
+        cache is emptied when parameters change, and dropped while `periodic` is False.
 
-                if self.interval is not None:
-                    self._cur += 1 / fps
-                    if self._cur > self.interval:
-                        self._cur = 0
-                        self.interval_reached(ceil)
+        If the script's parameters are changed while running, `parameters_changed` is called
+        before the next frame.
 
-                delta -= 1
+        If `render` returns False, the render loop will end. If `render` returns True (or nothing at all),
+        will continue running in a loop
+        """
+        scheduler = FrameScheduler(fps, late_frame_policy, spin_ns)
+        stats = ceil.frame_stats()
+        if stats is not None:
+            stats.start(fps)
+
+        self._parameters = ceil.script_parameters()
+        generation = 0
+        if self._parameters is not None:
+            generation = self._parameters.generation()
+            self._parameters.set_accepts_updates(
+                type(self).parameters_changed is not RenderState.parameters_changed
+            )
+
+        try:
+            self._render_loop(fps, ceil, scheduler, stats, generation)
+        finally:
+            if self._parameters is not None:
+                self._parameters.set_accepts_updates(False)
+            self._parameters = None
+
+    def _render_loop(
+        self,
+        fps: float,
+        ceil: Ceiling,
+        scheduler: FrameScheduler,
+        stats: Optional[FrameStats],
+        generation: int,
+    ) -> None:
+        # headless ceilings can run faster than real time, each frame still covering 1 / fps
+        realtime = ceil.realtime()
+        cache: Optional[FrameCache] = None
+        run = True
+        while run is True or run is None:
+            delta = (scheduler.wait_for_frame() if realtime else 1) / fps
+            check_stop()
+
+            if (
+                self._parameters is not None
+                and self._parameters.generation() != generation
+            ):
+                generation = self._parameters.generation()
+                self.parameters_changed(ceil)
+                if cache is not None:
+                    cache.clear()
+
+            start_ns = time.monotonic_ns()
+            show_ns = ceil.show_time_ns()
+            dropped = scheduler.frames_dropped
+
+            if self.cache_period and self.periodic and self.interval is not None:
+                if cache is None or cache.interval != self.interval:
+                    cache = FrameCache(
+                        self.interval,
+                        fps,
+                        ceil.number_lights(),
+                        self.frame_cache_bytes,
+                    )
+                run = self._render_cached(delta, ceil, cache)
+            else:
+                cache = None
+                run = self.render(delta, ceil)
+
+            if self.interval is not None:
+                self._cur += delta
+                if self._cur > self.interval:
+                    self._cur = 0
+                    self.interval_reached(ceil)
+
+            if stats is not None:
+                frame_ns = time.monotonic_ns() - start_ns
+                show_ns = ceil.show_time_ns() - show_ns
+                stats.record(
+                    start_ns,
+                    frame_ns - show_ns,
+                    show_ns,
+                    scheduler.last_lateness_ns,
+                    scheduler.frames_dropped - dropped,
+                )
+
+    def _render_cached(
+        self, delta: float, ceil: Ceiling, cache: FrameCache
+    ) -> Union[bool, None]:
+        """Shows the cached frame for this point in the interval, or renders it and caches it"""
+        phase = cache.phase(self._cur)
+        frame = cache.get(phase)
+        if frame is not None:
+            ceil.pixels()[:] = frame
+            ceil.show()
+            return True
+
+        shown = ceil.frames_shown()
+        run = self.render(delta, ceil)
+        # frames that didn't show exactly once aren't a single frame to replay
+        if ceil.frames_shown() == shown + 1:
+            cache.store(phase, ceil.pixels())
+        return run
 
     def progress(self) -> float:
         """Returns percetnage progress towards `_interval` (always 0..1)"""
@@ -14,6 +14,12 @@ window.addEventListener("load", function() {
     var btnStop = document.getElementsByClassName("stop")[0];
     btnStop.addEventListener("click", function(){ stop() });
 
+    var brightnessInput = document.getElementById("brightnessInput");
+    brightnessInput.addEventListener("change", brightnessChange);
+
+    var speedInput = document.getElementById("speedInput");
+    speedInput.addEventListener("change", speedChange);
+
     // Init color chooser with random color
     var colorInput = document.getElementById("colorInput");
     colorInput.value = random_hex_color();
@@ -85,6 +91,40 @@ function colorChange() {
 
 }
 
+function brightnessChange() {
+    var xhr = new XMLHttpRequest();
+
+    var brightness = document.getElementById("brightnessInput").value;
+    if (brightness == "") {
+        return;
+    }
+
+    var post = { brightness: brightness };
+
+    xhr.open("POST", `${URL}/control/brightness`, true);
+
+    // Send brightness request
+    xhr.setRequestHeader("Content-type", "application/json");
+    xhr.send(JSON.stringify(post));
+}
+
+function speedChange() {
+    var xhr = new XMLHttpRequest();
+
+    var speed = document.getElementById("speedInput").value;
+    if (speed == "" || speed <= 0) {
+        return;
+    }
+
+    var post = { interval: speed };
+
+    xhr.open("POST", `${URL}/control/interval`, true);
+
+    // Send interval request
+    xhr.setRequestHeader("Content-type", "application/json");
+    xhr.send(JSON.stringify(post));
+}
+
 function get_state() {
     fetch(`${URL}/state`)
         .then(res => res.json())
@@ -0,0 +1,59 @@
+// Live preview of the lights, streamed from the /preview SocketIO namespace
+const PREVIEW_LIGHT_RADIUS = 3;
+
+var previewPositions = null;
+var previewColors = null;
+
+window.addEventListener("load", function() {
+    var socket = io(`${URL}/preview`);
+    socket.on("layout", on_preview_layout);
+    socket.on("frame", on_preview_frame);
+});
+
+function on_preview_layout(layout) {
+    previewPositions = new Float32Array(layout.positions);
+    previewColors = new Uint8Array(layout.number_lights * 3);
+    draw_preview();
+}
+
+function on_preview_frame(frame) {
+    if (previewColors == null) {
+        return;
+    }
+
+    var colors = new Uint8Array(frame.colors);
+    if (frame.keyframe) {
+        previewColors.set(colors);
+    } else {
+        // only the lights that changed were sent
+        var indices = new Uint32Array(frame.indices);
+        for (var i = 0; i < indices.length; i++) {
+            previewColors.set(colors.subarray(i * 3, i * 3 + 3), indices[i] * 3);
+        }
+    }
+    draw_preview();
+}
+
+function draw_preview() {
+    var canvas = document.getElementById("preview");
+    var ctx = canvas.getContext("2d");
+    ctx.fillStyle = "black";
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+
+    for (var i = 0; i < previewColors.length / 3; i++) {
+        var x = previewPositions[i * 2];
+        var y = previewPositions[i * 2 + 1];
+        // lights missing from the arrangement file have no position
+        if (isNaN(x) || isNaN(y)) {
+            continue;
+        }
+
+        var r = previewColors[i * 3];
+        var g = previewColors[i * 3 + 1];
+        var b = previewColors[i * 3 + 2];
+        ctx.fillStyle = `rgb(${r}, ${g}, ${b})`;
+        ctx.beginPath();
+        ctx.arc(x * canvas.width, (1 - y) * canvas.height, PREVIEW_LIGHT_RADIUS, 0, 2 * Math.PI);
+        ctx.fill();
+    }
+}
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import os
+
+import numpy as np
+
+from backend.ceiling import Ceiling
+from backend.settings import preprocess_arrangement_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _ceiling() -> Ceiling:
+    arrangement_file = os.path.join(ROOT, "settings", "zigzag200.csv")
+    dimensions, number_lights = preprocess_arrangement_file(arrangement_file)
+    return Ceiling(
+        type="null",
+        rows=None,
+        number_lights=number_lights,
+        dimensions=dimensions,
+        arrangement_file=arrangement_file,
+        number_children_for_division=75,
+    )
+
+
+def test_list_of_tuples_palette():
+    ceil = _ceiling()
+    ceil.render_field(
+        lambda x, y, r, theta: (x > 0.5).astype(np.float64),
+        palette=[(0, 0, 0), (255, 255, 255)],
+    )
+    pixels = ceil.pixels()
+    placed = ~np.any(np.isnan(ceil.positions()), axis=1)
+    bright = placed & (ceil.positions()[:, 0] > 0.5)
+    assert bright.any()
+    assert np.all(pixels[bright] == 255)
+    assert np.all(pixels[~bright] == 0)
+
+
+def test_int64_array_palette():
+    ceil = _ceiling()
+    palette = np.array([(255, 0, 0), (0, 0, 255)], dtype=np.int64)
+    ceil.render_field(lambda x, y, r, theta: np.zeros_like(x), palette=palette)
+    placed = ~np.any(np.isnan(ceil.positions()), axis=1)
+    assert np.all(ceil.pixels()[placed] == (255, 0, 0))
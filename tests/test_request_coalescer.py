@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+from threading import Thread
+import time
+
+from backend.request_coalescer import RequestCoalescer
+
+
+def _submit_in_thread(coalescer, results, key, work, debounce=0.0) -> Thread:
+    thread = Thread(
+        target=lambda: results.append(coalescer.submit(key, work, debounce=debounce))
+    )
+    thread.start()
+    # let the thread take its place in line
+    time.sleep(0.02)
+    return thread
+
+
+def test_color_after_start_applies_after_it():
+    coalescer = RequestCoalescer()
+    applied = []
+    results = []
+
+    # the start is still waiting when the color is sent, and must not be overtaken
+    start = _submit_in_thread(
+        coalescer, results, "script", lambda: applied.append("start"), debounce=0.2
+    )
+    color = _submit_in_thread(
+        coalescer, results, "color", lambda: applied.append("color")
+    )
+    start.join()
+    color.join()
+
+    assert applied == ["start", "color"]
+
+
+def test_waiting_request_is_replaced_by_newer_one():
+    coalescer = RequestCoalescer()
+    applied = []
+    results = []
+
+    first = _submit_in_thread(
+        coalescer, results, "script", lambda: time.sleep(0.2) or "first"
+    )
+    threads = [
+        _submit_in_thread(coalescer, results, "color", lambda c=c: applied.append(c))
+        for c in ["red", "green"]
+    ]
+    for thread in [first] + threads:
+        thread.join()
+
+    assert applied == ["green"]
+    assert coalescer.coalesced == 1
+    assert sorted(results, key=str) == [None, None, "first"]
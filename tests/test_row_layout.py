@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from backend.row_layout import RowLayout, RowView
+
+
+class _Strip:
+    """Just the parts of `Ceiling` a `RowView` uses"""
+
+    def __init__(self, number_lights: int):
+        self.pixels = np.zeros((number_lights, 3), dtype=np.uint8)
+
+    def get_by_index(self, index):
+        return self.pixels[index]
+
+    def get_many(self, indices):
+        return self.pixels[indices]
+
+    def set_by_index(self, index, color):
+        self.pixels[index] = color
+
+    def set_many(self, indices, colors):
+        self.pixels[indices] = colors
+
+
+def test_reversed_row_covers_exactly_its_lights():
+    rows = [29, 29, 32]
+    strip = _Strip(sum(rows))
+    view = RowView(RowLayout(rows), strip)
+
+    view[1] = (255, 0, 0)
+
+    lit = np.flatnonzero(strip.pixels[:, 0])
+    assert lit.tolist() == list(range(29, 58))
+    assert RowLayout(rows).row_indices(1).tolist() == list(range(57, 28, -1))
+
+
+def test_last_reversed_row_stays_in_bounds():
+    rows = [32] * 32
+    strip = _Strip(sum(rows))
+    view = RowView(RowLayout(rows), strip)
+
+    view[31] = (0, 255, 0)
+
+    assert np.flatnonzero(strip.pixels[:, 1]).tolist() == list(range(992, 1024))
+
+
+def test_scalar_lookup_matches_array_lookup():
+    layout = RowLayout([5, 7, 4])
+    for row in range(3):
+        for col in range(layout.row_length(row)):
+            index = layout.index(row, col)
+            assert isinstance(index, int)
+            assert index == layout.index(np.array([row]), np.array([col]))[0]
+    assert layout.index(1, 0) == 11
+    assert layout.index(1, 6) == 5